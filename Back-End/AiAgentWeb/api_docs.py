@@ -0,0 +1,112 @@
+"""
+Swagger/ReDoc pages and the OpenAPI document they load.
+
+Generating the document introspects every viewset and serializer. That
+takes hundreds of milliseconds, so each worker does it once, on the first
+request, and keeps the result in ``schema_cache`` until the URLconf
+changes. The document never depends on the request: it embeds
+``OPENAPI_URL`` (by default no host, so clients use the one serving it),
+so arbitrary Host headers cannot add cache entries. ``python manage.py
+export_openapi`` writes the same document to ``OPENAPI_SCHEMA_FILE`` at
+deploy time, and nginx serves that file directly.
+
+drf_yasg is imported on the first docs request, not when ``urls.py``
+loads, so workers that only serve the API never load it.
+"""
+import functools
+import threading
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import get_resolver, get_urlconf
+from rest_framework import permissions
+from rest_framework.response import Response
+
+
+def api_info():
+    from drf_yasg import openapi
+    return openapi.Info(
+        title="AiAgentWeb API",
+        default_version='v1',
+        description="API documentation for AiAgentWeb project",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="yaldajafari383@gamil.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+class SchemaCache:
+    """Values computed once per URLconf; a new resolver (clear_url_caches, ROOT_URLCONF) drops them."""
+
+    def __init__(self):
+        # Reentrant: building the JSON body fetches the cached document.
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.resolver = None
+        self.entries = {}
+
+    def get(self, key, build):
+        resolver = get_resolver(get_urlconf())
+        # Held while building, so concurrent first requests generate once.
+        with self.lock:
+            if self.resolver is not resolver:
+                self.resolver = resolver
+                self.entries = {}
+            if key not in self.entries:
+                self.entries[key] = build()
+            return self.entries[key]
+
+
+schema_cache = SchemaCache()
+
+
+@functools.cache
+def schema_view_class():
+    from drf_yasg.views import get_schema_view
+
+    base = get_schema_view(api_info(), public=True, permission_classes=[permissions.AllowAny])
+
+    class SchemaView(base):
+        def get(self, request, version='', format=None):
+            if request.accepted_renderer.media_type == 'text/html':
+                # The UI pages render without paths and load the document from SPEC_URL.
+                return super().get(request, version, format)
+            return Response(cached_schema())
+
+    return SchemaView
+
+
+def encode_schema(document, path=''):
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    codec = OpenAPICodecYaml if path.endswith(('.yaml', '.yml')) else OpenAPICodecJson
+    return codec(validators=[]).encode(document)
+
+
+def cached_schema():
+    return schema_cache.get('document', lambda: generate_schema(settings.OPENAPI_URL or None))
+
+
+def schema_json(request):
+    body = schema_cache.get('json', lambda: encode_schema(cached_schema()))
+    return HttpResponse(body, content_type='application/json')
+
+
+def ui_view(renderer):
+    @functools.cache
+    def view():
+        return schema_view_class().with_ui(renderer, cache_timeout=0)
+
+    def docs(request, *args, **kwargs):
+        return view()(request, *args, **kwargs)
+    return docs
+
+
+swagger_ui = ui_view('swagger')
+redoc_ui = ui_view('redoc')
+
+
+def generate_schema(url=None):
+    """The document without a request; without ``url`` it has no host."""
+    generator_class = schema_view_class().generator_class
+    return generator_class(api_info(), url=url).get_schema(request=None, public=True)
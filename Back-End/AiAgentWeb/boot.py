@@ -0,0 +1,197 @@
+"""
+Container start-up: what ``manage.py boot`` and ``gunicorn.conf.py`` run.
+
+``boot`` takes ``boot_lock``, so replicas starting together migrate one at
+a time. It then skips every step whose inputs have not changed:
+
+* migrate, when no migration on disk is unapplied;
+* collectstatic, when ``static_fingerprint`` matches the one recorded in
+  ``BOOT_STATE_FILE``;
+* export_openapi, when ``source_fingerprint`` matches.
+
+``STATIC_ROOT`` (and so ``BOOT_STATE_FILE``) is the volume every replica
+and nginx share.
+
+gunicorn refuses to start several workers on a per-process cache
+(``shared_cache_problem``), imports the app in the master and runs
+``warm_up`` there before forking. Each worker reports its time to first request, measured from
+``BOOT_STARTED_AT``, which ``boot`` sets for the server it execs.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from time import perf_counter
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.signals import request_started
+from django.db import DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+
+STARTED_ENV = 'BOOT_STARTED_AT'
+LOCK_KEY = zlib.crc32(b'AiAgentWeb.boot')
+# Same defaults as collectstatic.
+IGNORE_PATTERNS = ['CVS', '.*', '*~']
+# Probes do not count as the first request.
+PROBE_PATHS = {'/ready', '/metrics'}
+
+started_at = float(os.environ.get(STARTED_ENV) or time.time())
+first_request_at = None
+
+
+@contextmanager
+def boot_lock(alias='default'):
+    """
+    A Postgres session-level advisory lock, so it also covers replicas on
+    other hosts. Other databases (SQLite in development) get a file lock,
+    which only covers this host.
+    """
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_KEY])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
+        return
+    with open(os.path.join(tempfile.gettempdir(), 'aiagentweb-boot.lock'), 'w') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def pending_migrations(alias='default'):
+    executor = MigrationExecutor(connections[alias])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def hash_files(digest, files):
+    for name, path in sorted(files):
+        digest.update(name.encode() + b'\0')
+        with open(path, 'rb') as fh:
+            while chunk := fh.read(1 << 16):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def static_fingerprint():
+    """Content hash of everything collectstatic would copy, keyed by destination path."""
+    files = {}
+    for finder in finders.get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            prefixed = os.path.join(getattr(storage, 'prefix', None) or '', path)
+            # Like collectstatic, the first finder to provide a path wins.
+            files.setdefault(prefixed, storage.path(path))
+    return hash_files(hashlib.blake2b(digest_size=16), files.items())
+
+
+def source_fingerprint():
+    """Content hash of the project's Python sources, which define the API schema."""
+    roots = {os.path.dirname(settings.ROOT_URLCONF.replace('.', os.sep))}
+    roots.update(config.path for config in apps.get_app_configs()
+                 if config.path.startswith(str(settings.BASE_DIR) + os.sep))
+    files = []
+    for root in roots:
+        root = os.path.join(settings.BASE_DIR, root)
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith(('.', '__pycache__'))]
+            files += [(os.path.relpath(os.path.join(directory, name), settings.BASE_DIR), os.path.join(directory, name))
+                      for name in filenames if name.endswith('.py')]
+    return hash_files(hashlib.blake2b(digest_size=16), files)
+
+
+def load_state():
+    try:
+        with open(settings.BOOT_STATE_FILE) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    path = settings.BOOT_STATE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(state, fh)
+    os.replace(path + '.tmp', path)
+
+
+def shared_cache_problem(workers):
+    """Why ``workers`` processes cannot run on the configured cache, or None."""
+    backend = settings.CACHES['default']['BACKEND']
+    if workers > 1 and backend == 'django.core.cache.backends.locmem.LocMemCache':
+        return (f'{workers} workers cannot share the per-process locmem cache; '
+                'set CACHE_URL to a shared cache (e.g. redis://redis:6379/1) or WEB_CONCURRENCY=1.')
+    return None
+
+
+def iter_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_up():
+    """
+    Does the one-off work that would otherwise land on each worker's first
+    requests: URL resolver population, serializer field construction and
+    the compiled read serializers. Touches no database connection, since
+    connections must not be shared with forked workers.
+    """
+    from course.fast_serializers import CompiledReadMixin, compile_serializer
+
+    started = perf_counter()
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for callback in iter_views(resolver.url_patterns):
+        view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is None:
+            continue
+        serializer_class().fields
+        if issubclass(view_class, CompiledReadMixin):
+            compile_serializer(serializer_class)
+    return perf_counter() - started
+
+
+def report_first_request(log):
+    """Logs, once per process, how long after boot the first real request arrived."""
+    def first_request(sender, environ=None, **kwargs):
+        global first_request_at
+        if environ is not None and environ.get('PATH_INFO') in PROBE_PATHS:
+            return
+        request_started.disconnect(dispatch_uid='boot-first-request')
+        first_request_at = time.time()
+        log.info('First request %.2fs after boot (pid %s)', first_request_at - started_at, os.getpid())
+
+    request_started.connect(first_request, weak=False, dispatch_uid='boot-first-request')
+
+
+def ready_view(request):
+    """Readiness for the container healthcheck: 503 until the database answers."""
+    try:
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        database = 'ok'
+    except DatabaseError as exc:
+        database = str(exc)
+    return JsonResponse({
+        'ready': database == 'ok',
+        'database': database,
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - started_at, 3),
+        'first_request_seconds': round(first_request_at - started_at, 3) if first_request_at else None,
+    }, status=200 if database == 'ok' else 503)
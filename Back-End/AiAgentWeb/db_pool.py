@@ -0,0 +1,47 @@
+"""
+Connection pool statistics for ``/api/db/pool/``.
+
+Pools live per alias *and per worker process*, so the numbers describe the
+worker that answered the request; its pid is included.
+"""
+import os
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def pool_stats(alias):
+    """Returns pool counters for ``alias``, or None when it is not pooled."""
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    is_open = not pool.closed
+    return {
+        # Django opens the pool on first use.
+        'open': is_open,
+        'min_size': stats.get('pool_min'),
+        'max_size': stats.get('pool_max'),
+        'size': stats.get('pool_size', 0),
+        'available': stats.get('pool_available', 0),
+        'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0) if is_open else 0,
+        'waiting': stats.get('requests_waiting', 0),
+        'created': stats.get('connections_num', 0),
+        'connection_errors': stats.get('connections_errors', 0),
+        'requests': stats.get('requests_num', 0),
+        'requests_queued': stats.get('requests_queued', 0),
+        'requests_timed_out': stats.get('requests_errors', 0),
+        'wait_ms': stats.get('requests_wait_ms', 0),
+    }
+
+
+def all_pool_stats():
+    return {alias: pool_stats(alias) for alias in connections}
+
+
+class PoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response({'pid': os.getpid(), 'pools': all_pool_stats()})
@@ -0,0 +1,188 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` marks each request as replica-safe or not and
+``ReplicaRouter`` acts on that mark:
+
+* Reads of ``REPLICA_APPS`` models during GET/HEAD/OPTIONS requests go to a
+  healthy replica, round-robin.
+* Everything else (writes, unsafe methods, management commands, workers,
+  and reads later in a request that has written) uses ``default``.
+* A client that wrote is pinned to ``default`` for ``REPLICA_PIN_SECONDS``
+  so it reads its own submissions and grades. The pin lives in the shared
+  cache, keyed by the Authorization header (or the client address), so it
+  holds across workers.
+* A request picks its replica once and keeps it for every read.
+* Replicas are probed at most every ``REPLICA_HEALTH_CHECK_INTERVAL``
+  seconds. One that is down or lags more than ``REPLICA_MAX_LAG_SECONDS``
+  is skipped until it recovers, and when none is usable reads fall back to
+  ``default``.
+
+Replica aliases come from ``DATABASE_REPLICA_URLS`` in settings. They copy
+the primary's connection options, so persistent connections and pooling
+apply per alias.
+"""
+import contextvars
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'db:pin:%s'
+UNPICKED = object()
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote', 'replica')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        # Picked on the first routed read and kept for the whole request.
+        self.replica = UNPICKED
+
+
+
+current_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_lag(connection):
+    """
+    Seconds the replica is behind, 0 where not applicable. A replica that has
+    replayed everything it received is current however long ago the primary
+    last wrote, so the replay timestamp is only used while replay is behind.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+        )
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def check_replica(alias):
+    connection = connections[alias]
+    try:
+        if connection.connection is None:
+            connection.ensure_connection()
+        elif not connection.is_usable():
+            connection.close()
+            connection.ensure_connection()
+        lag = replica_lag(connection)
+    except DatabaseError as exc:
+        logger.warning('Replica %s is unavailable: %s', alias, exc)
+        return False
+    if lag > settings.REPLICA_MAX_LAG_SECONDS:
+        logger.warning('Replica %s lags %.1fs behind the primary', alias, lag)
+        return False
+    return True
+
+
+class ReplicaHealth:
+    """Per-process health cache so replicas are probed once per interval, not per query."""
+
+    def __init__(self):
+        self.checked = {}
+        self.lock = threading.Lock()
+
+    def cached(self, alias):
+        checked_at, healthy = self.checked.get(alias, (None, False))
+        if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            return healthy
+        return None
+
+    def is_healthy(self, alias):
+        healthy = self.cached(alias)
+        if healthy is not None:
+            return healthy
+        with self.lock:
+            # Threads that queued behind a probe reuse its result.
+            healthy = self.cached(alias)
+            if healthy is None:
+                healthy = check_replica(alias)
+                self.checked[alias] = (time.monotonic(), healthy)
+        return healthy
+
+    def reset(self):
+        self.checked.clear()
+
+
+health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.rotation = itertools.count()
+
+    def pick_replica(self):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        start = next(self.rotation)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if health.is_healthy(alias):
+                return alias
+        return None
+
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is None or not state.use_replica or model._meta.app_label not in settings.REPLICA_APPS:
+            return None
+        if state.replica is UNPICKED:
+            state.replica = self.pick_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+            state.use_replica = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def pin_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION')
+    if credentials:
+        ident = credentials
+    else:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        ident = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR', '')
+    return PIN_KEY % hashlib.sha256(ident.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = pin_key(request)
+        use_replica = request.method in SAFE_METHODS and cache.get(key) is None
+        state = RoutingState(use_replica)
+        token = current_state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            current_state.reset(token)
+            if state.wrote:
+                cache.set(key, True, settings.REPLICA_PIN_SECONDS)
@@ -0,0 +1,107 @@
+"""
+orjson-backed JSON renderer and parser, shared by every app's API views.
+Both fall back to DRF's stock classes when orjson is not installed.
+"""
+import io
+from django.conf import settings
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson else 0
+)
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+# DRF's own fallback for values orjson has no native encoding for (lazy
+# strings, Decimal, QuerySets, ...) and for datetimes, so their text matches
+# the stock renderer.
+encode_default = encoders.JSONEncoder().default
+
+
+def contains_error_detail(data):
+    if isinstance(data, ErrorDetail):
+        return True
+    if isinstance(data, dict):
+        return any(contains_error_detail(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(contains_error_detail(value) for value in data)
+    return False
+
+
+def is_error_response(data, renderer_context):
+    """
+    True for payloads produced by DRF's exception handler, or error statuses
+    carrying ``ErrorDetail`` values. Success payloads are never walked.
+    """
+    response = renderer_context.get('response')
+    if response is None:
+        return contains_error_detail(data)
+    if getattr(response, 'exception', False):
+        return True
+    return response.status_code >= 400 and contains_error_detail(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes straight to bytes with orjson when it is
+    installed. Output matches the stock renderer: compact, UTF-8, U+2028 and
+    U+2029 escaped, DRF's encoder for datetimes and other non-JSON types.
+    Indented output, non-default JSON settings and a missing orjson all use
+    the stock path.
+
+    With ``error_envelope`` set, error payloads are wrapped as
+    ``{"errors": ...}``.
+    """
+    error_envelope = False
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.error_envelope and is_error_response(data, renderer_context):
+            data = {'errors': data}
+
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Out-of-range integers and the like: let json raise or cope.
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    ``JSONParser`` backed by orjson when it is installed. Bodies orjson
+    rejects are re-parsed by the stock parser, so error messages and
+    non-strict settings behave exactly as before.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        raw = stream.read()
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                raw = raw.decode(encoding)
+            return orjson.loads(raw)
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            if isinstance(raw, str):
+                raw = raw.encode(encoding)
+            return super().parse(io.BytesIO(raw), media_type, parser_context)
@@ -0,0 +1,239 @@
+"""
+Request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, per route (the resolved URL name, never the
+raw path) and method:
+
+* a latency histogram,
+* SQL query count and time (an execute wrapper installed once per
+  connection, which reports to the current request's timer),
+* response bytes,
+* a request counter per status code.
+
+It also adds a ``Server-Timing`` header with ``db``, ``serialize``
+(response rendering) and ``total`` durations.
+
+Each worker keeps its counters in memory. With ``METRICS_DIR`` set, it
+writes them to ``<METRICS_DIR>/metrics-<pid>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds. ``/metrics`` sums every worker's
+snapshot, so a scrape that lands on any gunicorn worker sees the totals.
+The directory must be emptied when the server starts, because counters
+only ever grow.
+"""
+import atexit
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+from time import monotonic, perf_counter
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = 'unmatched'
+
+
+class Registry:
+    """Counters of one process, keyed by ``(route, method)``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self.statuses = {}
+            self.last_flush = monotonic()
+
+    def observe(self, route, method, status, seconds, queries, db_seconds, size):
+        key = (route, method)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # count, sum, buckets..., queries, db seconds, bytes
+                series = self.series[key] = [0, 0.0, [0] * (len(BUCKETS) + 1), 0, 0.0, 0]
+            series[0] += 1
+            series[1] += seconds
+            series[2][bisect.bisect_left(BUCKETS, seconds)] += 1
+            series[3] += queries
+            series[4] += db_seconds
+            series[5] += size
+            status_key = (route, method, status)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'series': [[route, method, s[0], s[1], list(s[2]), s[3], s[4], s[5]]
+                           for (route, method), s in self.series.items()],
+                'statuses': [[route, method, status, count]
+                             for (route, method, status), count in self.statuses.items()],
+            }
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if not directory or (not force and monotonic() - self.last_flush < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.last_flush = monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(path + '.tmp', path)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def collect():
+    """This process's snapshot merged with every other worker's last flush."""
+    snapshots = [registry.snapshot()]
+    if settings.METRICS_DIR:
+        registry.flush(force=True)
+        own = os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+
+    series, statuses = {}, {}
+    for snapshot in snapshots:
+        for route, method, count, total, buckets, queries, db_seconds, size in snapshot['series']:
+            merged = series.setdefault((route, method), [0, 0.0, [0] * len(buckets), 0, 0.0, 0])
+            merged[0] += count
+            merged[1] += total
+            merged[2] = [a + b for a, b in zip(merged[2], buckets)]
+            merged[3] += queries
+            merged[4] += db_seconds
+            merged[5] += size
+        for route, method, status, count in snapshot['statuses']:
+            statuses[(route, method, status)] = statuses.get((route, method, status), 0) + count
+    return series, statuses
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    series, statuses = collect()
+    lines = [
+        '# HELP http_requests_total Requests by route, method and status.',
+        '# TYPE http_requests_total counter',
+    ]
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append(f'http_requests_total{{route="{label(route)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Request latency by route and method.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (route, method), (count, total, buckets, *_) in sorted(series.items()):
+        labels = f'route="{label(route)}",method="{method}"'
+        cumulative = 0
+        for bound, hits in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += hits
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {total}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {count}')
+
+    for name, index, kind, help_text in (
+        ('http_request_db_queries_total', 3, 'counter', 'SQL queries run while serving requests.'),
+        ('http_request_db_seconds_total', 4, 'counter', 'Time spent in SQL while serving requests.'),
+        ('http_response_bytes_total', 5, 'counter', 'Response body bytes, streaming responses excluded.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for (route, method), values in sorted(series.items()):
+            lines.append(f'{name}{{route="{label(route)}",method="{method}"}} {values[index]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+current_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.db_seconds += perf_counter() - started
+        timer.queries += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed once per connection object, not per request: looking up
+    # connections[alias] costs more than the rest of the middleware together.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='metrics-query-recorder')
+
+
+class RequestTimer:
+    __slots__ = ('queries', 'db_seconds', 'render_started', 'render_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = 0.0
+
+    def rendered(self, response):
+        self.render_seconds = perf_counter() - self.render_started
+
+
+class MetricsMiddleware:
+    """Keep first in MIDDLEWARE so the timings cover every other middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened before the middleware loaded missed the signal.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        started = perf_counter()
+        timer = request.metrics_timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        elapsed = perf_counter() - started
+
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match is not None else UNMATCHED
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, elapsed,
+                         timer.queries, timer.db_seconds, size)
+        response['Server-Timing'] = (
+            f'db;dur={timer.db_seconds * 1000:.2f}, serialize;dur={timer.render_seconds * 1000:.2f}, '
+            f'total;dur={elapsed * 1000:.2f}'
+        )
+        registry.flush()
+        return response
+
+    def process_template_response(self, request, response):
+        # Outermost middleware: runs right before Django renders the response.
+        timer = request.metrics_timer
+        timer.render_started = perf_counter()
+        response.add_post_render_callback(timer.rendered)
+        return response
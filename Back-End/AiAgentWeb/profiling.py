@@ -0,0 +1,284 @@
+"""
+On-demand profiling of single requests, for staff.
+
+A request is profiled when it carries ``X-Profile: sample|trace`` or the
+``_profile=sample|trace`` query parameter (an empty value or ``1`` means
+``sample``) *and* its user is staff, via the session or a JWT bearer token.
+
+* ``sample``: a thread reads the request thread's stack every
+  ``PROFILE_SAMPLE_INTERVAL`` seconds. Weights are sample counts. Low
+  overhead, but short requests may get few samples, since the sampler
+  needs the GIL.
+* ``trace``: ``sys.setprofile`` sees every call, and weights are
+  microseconds of self time. Exact, but the request runs several times
+  slower.
+
+Both record every SQL statement on every database alias, with its duration
+and the project frames that issued it. The report is stored in the default
+cache for ``PROFILE_TTL`` seconds. Its id is returned in ``X-Profile-Id``.
+
+* ``/api/profiles/<id>/`` serves the whole report.
+* ``/api/profiles/<id>/stacks/`` serves the collapsed stacks, for
+  ``flamegraph.pl`` or speedscope.
+
+With several workers, ``CACHE_URL`` must point to a shared cache.
+
+Requests that do not ask for a profile cost one header lookup and one
+substring test. No profiler, wrapper or thread is touched.
+"""
+import functools
+import os
+import sys
+import threading
+import uuid
+from contextlib import ExitStack
+from time import perf_counter, perf_counter_ns
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from account.authentication import CachedJWTAuthentication
+
+HEADER = 'HTTP_X_PROFILE'
+FLAG = '_profile'
+MODES = {'': 'sample', '1': 'sample', 'sample': 'sample', 'trace': 'trace'}
+CACHE_KEY = 'profile:%s'
+ORIGIN_DEPTH = 5
+
+
+@functools.lru_cache(maxsize=None)
+def short_path(filename):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base) and 'site-packages' not in filename:
+        return filename[len(base):]
+    for entry in sorted(sys.path, key=len, reverse=True):
+        if entry and filename.startswith(entry + os.sep):
+            return filename[len(entry) + 1:]
+    return filename
+
+
+def is_project_file(filename):
+    # The AiAgentWeb package only holds middleware and wrappers around the
+    # code that actually issues queries.
+    return (filename.startswith(str(settings.BASE_DIR) + os.sep) and 'site-packages' not in filename
+            and not filename.startswith(os.path.dirname(__file__) + os.sep))
+
+
+@functools.lru_cache(maxsize=None)
+def code_label(code):
+    return f'{short_path(code.co_filename)}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def function_label(function):
+    module = getattr(function, '__module__', None) or 'builtins'
+    return f'{module}:{getattr(function, "__qualname__", repr(function))}'
+
+
+class Sampler:
+    mode = 'sample'
+    unit = 'samples'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = {}
+        self.done = threading.Event()
+
+    def start(self):
+        # Frames above the caller (server, other middleware) are not sampled.
+        self.root = sys._getframe(1)
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root:
+                stack.append(code_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def collapsed(self):
+        return self.stacks
+
+
+class Tracer:
+    mode = 'trace'
+    unit = 'microseconds'
+
+    def __init__(self):
+        self.stack = []
+        self.stacks = {}
+
+    def start(self):
+        self.last = perf_counter_ns()
+        sys.setprofile(self.event)
+
+    def stop(self):
+        sys.setprofile(None)
+
+    def event(self, frame, event, arg):
+        now = perf_counter_ns()
+        if self.stack:
+            key = tuple(self.stack)
+            self.stacks[key] = self.stacks.get(key, 0) + now - self.last
+        if event == 'call':
+            self.stack.append(code_label(frame.f_code))
+        elif event == 'c_call':
+            self.stack.append(function_label(arg))
+        elif self.stack:
+            # return, c_return, c_exception. Returns past the starting frame
+            # find an empty stack.
+            self.stack.pop()
+        self.last = perf_counter_ns()
+
+    def collapsed(self):
+        stacks = {}
+        for key, nanoseconds in self.stacks.items():
+            if nanoseconds >= 1000:
+                stacks[key] = nanoseconds // 1000
+        return stacks
+
+
+class QueryRecorder:
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            if len(self.queries) < settings.PROFILE_MAX_QUERIES:
+                self.queries.append({
+                    'alias': self.alias,
+                    'sql': sql,
+                    'params': repr(params)[:500],
+                    'many': many,
+                    'ms': round(duration * 1000, 3),
+                    'origin': query_origin(sys._getframe(1)),
+                })
+
+
+def query_origin(frame):
+    """The innermost project frames (``path:line in function``) that led to a query."""
+    origin = []
+    while frame is not None and len(origin) < ORIGIN_DEPTH:
+        code = frame.f_code
+        if is_project_file(code.co_filename):
+            origin.append(f'{short_path(code.co_filename)}:{frame.f_lineno} in {code.co_name}')
+        frame = frame.f_back
+    return origin
+
+
+def requested_mode(request):
+    value = request.META.get(HEADER)
+    if value is None:
+        value = request.GET.get(FLAG)
+    if value is None:
+        return None
+    return MODES.get(value.strip().lower())
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and result[0].is_staff
+
+
+def save_report(report):
+    cache.set(CACHE_KEY % report['id'], report, settings.PROFILE_TTL)
+
+
+def load_report(profile_id):
+    report = cache.get(CACHE_KEY % profile_id)
+    if report is None:
+        raise NotFound('Profile not found or expired.')
+    return report
+
+
+class ProfilingMiddleware:
+    """Place after AuthenticationMiddleware, so session staff are recognised."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if HEADER not in request.META and FLAG not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        mode = requested_mode(request)
+        if mode is None or not is_staff(request):
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode):
+        profiler = Tracer() if mode == 'trace' else Sampler(settings.PROFILE_SAMPLE_INTERVAL)
+        queries = []
+        started_at = timezone.now()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(QueryRecorder(alias, queries)))
+            started = perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            elapsed = perf_counter() - started
+
+        profile_id = uuid.uuid4().hex
+        stacks = sorted(profiler.collapsed().items(), key=lambda item: item[1], reverse=True)
+        save_report({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'mode': profiler.mode,
+            'unit': profiler.unit,
+            'started_at': started_at.isoformat(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'pid': os.getpid(),
+            'stacks': [[';'.join(key), weight] for key, weight in stacks],
+            'sql_count': len(queries),
+            'sql_ms': round(sum(query['ms'] for query in queries), 3),
+            'sql': queries,
+        })
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Url'] = request.build_absolute_uri(reverse('profile-detail', args=[profile_id]))
+        return response
+
+
+class ProfileView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, format=None):
+        return Response(load_report(profile_id))
+
+
+class ProfileStacksView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, format=None):
+        report = load_report(profile_id)
+        body = ''.join(f'{stack} {weight}\n' for stack, weight in report['stacks'])
+        return HttpResponse(body, content_type='text/plain; charset=utf-8')
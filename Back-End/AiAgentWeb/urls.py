@@ -18,30 +18,27 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="AiAgentWeb API",
-      default_version='v1',
-      description="API documentation for AiAgentWeb project",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="yaldajafari383@gamil.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=[permissions.AllowAny],
-)
+from .api_docs import redoc_ui, schema_json, swagger_ui
+from .boot import ready_view
+from .db_pool import PoolStatsView
+from .metrics import metrics_view
+from .profiling import ProfileStacksView, ProfileView
 
 urlpatterns = [
     path('api/admin/', admin.site.urls),
     path('api/user/', include('account.urls')),
     path('api/course/', include('course.urls')),
+    path('api/db/pool/', PoolStatsView.as_view(), name='db-pool-stats'),
+    path('api/profiles/<str:profile_id>/', ProfileView.as_view(), name='profile-detail'),
+    path('api/profiles/<str:profile_id>/stacks/', ProfileStacksView.as_view(), name='profile-stacks'),
+    # Scraped inside the docker network; nginx does not proxy it.
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', ready_view, name='ready'),
 
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # nginx serves swagger/openapi.json from the export_openapi file when present.
+    path('swagger/openapi.json', schema_json, name='schema-json'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', redoc_ui, name='schema-redoc'),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from course import models
-from .models import User
+from .models import EmailOutbox, User
 
 
 class UserModelAdmin(BaseUserAdmin):
@@ -34,7 +34,10 @@ class UserModelAdmin(BaseUserAdmin):
 
 # Now register the new UserAdmin...
 admin.site.register(User, UserModelAdmin)
+admin.site.register(EmailOutbox)
 admin.site.register(models.Topic)
 admin.site.register(models.Video)
 admin.site.register(models.Task)
-admin.site.register(models.Submission)
\ No newline at end of file
+admin.site.register(models.Submission)
+admin.site.register(models.TestCase)
+admin.site.register(models.GradingRun)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+VERSION_KEY = 'account:user-version:%s'
+
+
+class UserCache:
+  """
+  Bounded, per-process LRU of authenticated users with a TTL.
+
+  Saves and deletes evict the entry locally and bump a version key in the
+  shared Django cache; other workers compare that version on every hit, so
+  with a shared cache backend (redis, memcached) an invalidation reaches all
+  workers immediately. Writes that bypass signals (``QuerySet.update``) are
+  bounded by the TTL: no entry is ever served past it.
+  """
+
+  def __init__(self, max_size, ttl):
+    self.max_size = max_size
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, user_id):
+    with self.lock:
+      entry = self.entries.get(user_id)
+      if entry is None:
+        return None
+      user, cached_at, version = entry
+      if time.monotonic() - cached_at >= self.ttl:
+        del self.entries[user_id]
+        return None
+      self.entries.move_to_end(user_id)
+    if self.version(user_id) != version:
+      self.evict(user_id)
+      return None
+    # Views may mutate request.user; never hand out the shared instance.
+    return copy.copy(user)
+
+  def version(self, user_id):
+    return cache.get(VERSION_KEY % user_id)
+
+  def set(self, user_id, user, version):
+    """
+    Caches ``user`` under ``version``, read with ``version()`` before the
+    row was fetched: an invalidation landing in between then makes the entry
+    stale instead of being masked.
+    """
+    with self.lock:
+      self.entries[user_id] = (copy.copy(user), time.monotonic(), version)
+      self.entries.move_to_end(user_id)
+      while len(self.entries) > self.max_size:
+        self.entries.popitem(last=False)
+
+  def evict(self, user_id):
+    with self.lock:
+      self.entries.pop(user_id, None)
+
+  def invalidate(self, user_id):
+    """Evicts ``user_id`` here and, through the shared cache, in every other worker."""
+    self.evict(user_id)
+    cache.set(VERSION_KEY % user_id, time.time_ns(), None)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+
+user_cache = UserCache(
+  max_size=settings.AUTH_USER_CACHE_SIZE,
+  ttl=settings.AUTH_USER_CACHE_TTL,
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+  """``JWTAuthentication`` that resolves users from ``user_cache`` when possible."""
+
+  def get_user(self, validated_token):
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    user = user_cache.get(user_id) if user_id is not None else None
+    if user is None:
+      version = user_cache.version(user_id)
+      user = super().get_user(validated_token)
+      user_cache.set(user_id, user, version)
+      return user
+
+    # Same checks as the parent, against the cached row.
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+      raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if api_settings.CHECK_REVOKE_TOKEN:
+      if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+    return user
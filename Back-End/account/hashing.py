@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from account.models import User
+
+
+class HashingOverloaded(APIException):
+  status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+  default_detail = 'Too many sign-in requests right now, please retry shortly.'
+  default_code = 'hashing_overloaded'
+
+
+class HashingExecutor:
+  """
+  Bounded thread pool for password hashing.
+
+  At most ``workers`` hashes run at once and at most ``queue_size`` more wait
+  for a slot; anything beyond that is refused with ``HashingOverloaded``
+  instead of queueing behind a login burst. The caller's request thread waits
+  for the result, so this only pays off with threaded workers (gunicorn
+  gthread, ``WEB_THREADS``): slots are sized below the thread count, so
+  logins can never occupy every thread. PBKDF2 runs in OpenSSL without the
+  GIL, so the pool hashes in parallel while the other threads keep serving
+  requests.
+  """
+
+  def __init__(self, workers, queue_size, timeout):
+    self.timeout = timeout
+    self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+  def submit(self, fn, *args, **kwargs):
+    if not self.slots.acquire(blocking=False):
+      raise HashingOverloaded()
+    try:
+      future = self.pool.submit(fn, *args, **kwargs)
+    except BaseException:
+      self.slots.release()
+      raise
+    future.add_done_callback(lambda f: self.slots.release())
+    return future
+
+  def run(self, fn, *args, **kwargs):
+    try:
+      return self.submit(fn, *args, **kwargs).result(timeout=self.timeout)
+    except TimeoutError:
+      raise HashingOverloaded()
+
+
+executor = HashingExecutor(
+  workers=settings.AUTH_HASHING_WORKERS,
+  queue_size=settings.AUTH_HASHING_QUEUE,
+  timeout=settings.AUTH_HASHING_TIMEOUT,
+)
+
+
+def hash_password(password):
+  return executor.run(make_password, password)
+
+
+def authenticate_user(email, password):
+  """
+  Same outcome as ``authenticate(email=..., password=...)`` with the model
+  backend, but with every hash computed on the executor. Database access
+  stays on the calling thread.
+  """
+  user = User._default_manager.filter(email=email).first()
+  if user is None:
+    # Hash anyway so unknown emails take as long as wrong passwords.
+    hash_password(password)
+    return None
+
+  outdated = []
+  if not executor.run(check_password, password, user.password, setter=outdated.append):
+    return None
+  if outdated:
+    # Hasher or iteration count changed since this password was stored.
+    user.password = hash_password(password)
+    user.save(update_fields=['password'])
+  return user if user.is_active else None
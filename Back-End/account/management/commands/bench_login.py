@@ -0,0 +1,55 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from account.hashing import executor
+from account.models import User
+from account.views import UserLoginView
+
+EMAIL = 'bench-login@example.invalid'
+PASSWORD = 'bench-login-password'
+
+
+class Command(BaseCommand):
+    help = 'Measures logins per second against the login view for increasing client concurrency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=64, help='Login requests per measurement.')
+        parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 4, 16, 64],
+                            help='Concurrent clients to measure.')
+
+    def handle(self, *args, **options):
+        # Throttles would turn the benchmark into a 429 benchmark.
+        view = UserLoginView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        body = json.dumps({'email': EMAIL, 'password': PASSWORD})
+
+        def login(_):
+            request = factory.post('/api/user/login/', body, content_type='application/json')
+            started = time.perf_counter()
+            response = view(request)
+            return response.status_code, time.perf_counter() - started
+
+        User.objects.filter(email=EMAIL).delete()
+        User.objects.create_user(email=EMAIL, name='Bench', password=PASSWORD)
+        try:
+            self.stdout.write(
+                f'{options["logins"]} logins per run, hashing pool: {executor.pool._max_workers} worker(s)'
+            )
+            for clients in options['concurrency']:
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=clients) as pool:
+                    results = list(pool.map(login, range(options['logins'])))
+                elapsed = time.perf_counter() - started
+                ok = [latency for code, latency in results if code == 200]
+                refused = sum(1 for code, _ in results if code == 503)
+                p50 = statistics.median(ok) * 1000 if ok else 0
+                worst = max(ok) * 1000 if ok else 0
+                self.stdout.write(
+                    f'clients={clients:<3} {len(ok) / elapsed:8.1f} logins/s  '
+                    f'p50={p50:7.1f}ms  max={worst:7.1f}ms  refused={refused}'
+                )
+        finally:
+            User.objects.filter(email=EMAIL).delete()
@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from account.outbox import claim_emails, requeue_stale_emails, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued emails from the outbox in batches over a reused mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages sent per connection.')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait for new mail when the outbox is empty.')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=float, default=30.0,
+                            help='Seconds before the first retry; doubled on each further failure.')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds after which a message stuck in SENDING is queued again.')
+        parser.add_argument('--once', action='store_true', help='Exit once no message is due.')
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        total_sent = total_failed = 0
+        last_sweep = 0
+        while True:
+            close_old_connections()
+            if time.monotonic() - last_sweep > stale_after.total_seconds() / 2:
+                requeue_stale_emails(stale_after, options['max_attempts'])
+                last_sweep = time.monotonic()
+
+            emails = claim_emails(options['batch_size'])
+            if not emails:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                sent, failed = send_batch(emails, options['max_attempts'], options['backoff'])
+            except Exception as exc:
+                # The claimed messages stay in SENDING; the stale sweep counts
+                # the attempt and requeues or gives them up.
+                self.stderr.write(f'batch of {len(emails)} aborted: {exc!r}')
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            total_sent += sent
+            total_failed += failed
+            if failed:
+                self.stderr.write(f'{failed} message(s) failed and were rescheduled or given up')
+
+        self.stdout.write(self.style.SUCCESS(f'sent {total_sent} email(s), {total_failed} failure(s)'))
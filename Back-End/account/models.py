@@ -1,11 +1,13 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import BaseUserManager,AbstractBaseUser
 
 #  Custom User Manager
 class UserManager(BaseUserManager):
-  def create_user(self, email, name, password=None, password2=None):
+  def create_user(self, email, name, password=None, password2=None, hashed=False):
       """
       Creates and saves a User with the given email, name and password.
+      Pass hashed=True when password is already an encoded hash.
       """
       if not email:
           raise ValueError('User must have an email address')
@@ -15,7 +17,10 @@ class UserManager(BaseUserManager):
           name=name,
       )
 
-      user.set_password(password)
+      if hashed:
+          user.password = password
+      else:
+          user.set_password(password)
       user.save(using=self._db)
       return user
 
@@ -70,4 +75,35 @@ class User(AbstractBaseUser):
       return self.is_admin
 
 
+#  Outgoing email, written in the same transaction as the change that caused it
+#  and delivered by `manage.py send_outbox`.
+class EmailOutbox(models.Model):
+  PENDING = 'pending'
+  SENDING = 'sending'
+  SENT = 'sent'
+  FAILED = 'failed'
+  STATUS_CHOICES = [
+    (PENDING, 'Pending'),
+    (SENDING, 'Sending'),
+    (SENT, 'Sent'),
+    (FAILED, 'Failed'),
+  ]
 
+  to_email = models.EmailField(max_length=255)
+  from_email = models.CharField(max_length=255, blank=True)
+  subject = models.CharField(max_length=255)
+  body = models.TextField()
+  status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+  attempts = models.PositiveIntegerField(default=0)
+  last_error = models.TextField(blank=True)
+  claim_token = models.UUIDField(null=True, blank=True)
+  next_attempt_at = models.DateTimeField(default=timezone.now)
+  claimed_at = models.DateTimeField(null=True, blank=True)
+  sent_at = models.DateTimeField(null=True, blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_queue_idx')]
+
+  def __str__(self):
+    return f'{self.subject} -> {self.to_email} ({self.status})'
@@ -0,0 +1,119 @@
+import uuid
+from datetime import timedelta
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from account.models import EmailOutbox
+
+
+def queue_email(subject, body, to_email, from_email=''):
+  """Queues a message for ``send_outbox``; a single INSERT, never touches SMTP."""
+  return EmailOutbox.objects.create(subject=subject, body=body, to_email=to_email, from_email=from_email or '')
+
+
+def retry_delay(attempts, base, cap=3600):
+  """Exponential backoff: base, 2*base, 4*base, ... seconds, at most ``cap``."""
+  return timedelta(seconds=min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+def claim_emails(limit):
+  """
+  Atomically moves up to ``limit`` due messages to SENDING and returns them,
+  the same way ``course.grading.claim_runs`` claims grading runs.
+  """
+  token = uuid.uuid4()
+  now = timezone.now()
+  due = EmailOutbox.objects.filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+  claim = dict(status=EmailOutbox.SENDING, claim_token=token, claimed_at=now)
+
+  if connection.features.has_select_for_update_skip_locked:
+    with transaction.atomic():
+      ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+      EmailOutbox.objects.filter(id__in=ids).update(**claim)
+  else:
+    EmailOutbox.objects.filter(id__in=due.values('id')[:limit], status=EmailOutbox.PENDING).update(**claim)
+  return list(EmailOutbox.objects.filter(claim_token=token).order_by('id'))
+
+
+def requeue_stale_emails(timeout, max_attempts):
+  """
+  Returns messages whose sender died mid-batch to the queue, counting that
+  as an attempt, or gives them up after ``max_attempts``.
+  """
+  cutoff = timezone.now() - timeout
+  stale = EmailOutbox.objects.filter(status=EmailOutbox.SENDING, claimed_at__lt=cutoff)
+  failed = stale.filter(attempts__gte=max_attempts - 1).update(
+    status=EmailOutbox.FAILED, claim_token=None, attempts=F('attempts') + 1,
+    last_error='Sender did not finish the batch.')
+  requeued = stale.update(status=EmailOutbox.PENDING, claim_token=None, attempts=F('attempts') + 1)
+  return requeued, failed
+
+
+def record_failure(email, exc, max_attempts, backoff):
+  email.attempts += 1
+  email.last_error = repr(exc)
+  email.claim_token = None
+  if email.attempts >= max_attempts:
+    email.status = EmailOutbox.FAILED
+  else:
+    email.status = EmailOutbox.PENDING
+    email.next_attempt_at = timezone.now() + retry_delay(email.attempts, backoff)
+  email.save(update_fields=['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'])
+
+
+def close_quietly(mail_connection):
+  try:
+    mail_connection.close()
+  except Exception:
+    pass
+
+
+def send_batch(emails, max_attempts, backoff, mail_connection=None):
+  """
+  Sends ``emails`` over one SMTP connection and records each outcome.
+
+  Messages go out one ``send_messages`` call at a time on the open
+  connection, so a rejected recipient only reschedules its own message. A
+  failure also recycles the connection in case the server dropped it. If
+  the connection cannot be (re)opened, e.g. during an SMTP outage, every
+  message not yet sent counts a failed attempt and is rescheduled with
+  backoff. Returns ``(sent, failed)``.
+  """
+  mail_connection = mail_connection or get_connection()
+  sent = failed = 0
+  emails = list(emails)
+  connected = False
+  try:
+    for position, email in enumerate(emails):
+      if not connected:
+        try:
+          mail_connection.open()
+        except Exception as exc:
+          for unsent in emails[position:]:
+            record_failure(unsent, exc, max_attempts, backoff)
+          return sent, failed + len(emails) - position
+        connected = True
+      message = EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=[email.to_email],
+        connection=mail_connection,
+      )
+      try:
+        mail_connection.send_messages([message])
+      except Exception as exc:
+        failed += 1
+        record_failure(email, exc, max_attempts, backoff)
+        close_quietly(mail_connection)
+        connected = False
+      else:
+        sent += 1
+        email.attempts += 1
+        email.status = EmailOutbox.SENT
+        email.sent_at = timezone.now()
+        email.save(update_fields=['attempts', 'status', 'sent_at'])
+  finally:
+    close_quietly(mail_connection)
+  return sent, failed
@@ -1,13 +1,6 @@
-from rest_framework import renderers
-import json
+from AiAgentWeb.fast_json import FastJSONRenderer
 
-class UserRenderer(renderers.JSONRenderer):
+class UserRenderer(FastJSONRenderer):
+  # Errors keep the {'errors': ...} envelope the frontend expects.
   charset='utf-8'
-  def render(self, data, accepted_media_type=None, renderer_context=None):
-    response = ''
-    if 'ErrorDetail' in str(data):
-      response = json.dumps({'errors':data})
-    else:
-      response = json.dumps(data)
-    
-    return response
\ No newline at end of file
+  error_envelope = True
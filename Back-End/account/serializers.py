@@ -4,6 +4,7 @@ from django.utils.encoding import smart_str, force_bytes, DjangoUnicodeDecodeErr
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from account.utils import Util
+from account.hashing import hash_password
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
   # We are writing this becoz we need confirm password field in our Registratin Request
@@ -24,7 +25,9 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     return attrs
 
   def create(self, validate_data):
-    return User.objects.create_user(**validate_data)
+    # Hash on the bounded pool rather than inside create_user.
+    validate_data['password'] = hash_password(validate_data['password'])
+    return User.objects.create_user(hashed=True, **validate_data)
 
 class UserLoginSerializer(serializers.ModelSerializer):
   email = serializers.EmailField(max_length=255)
@@ -63,12 +66,9 @@ class SendPasswordResetEmailSerializer(serializers.Serializer):
     if User.objects.filter(email=email).exists():
       user = User.objects.get(email = email)
       uid = urlsafe_base64_encode(force_bytes(user.id))
-      print('Encoded UID', uid)
       token = PasswordResetTokenGenerator().make_token(user)
-      print('Password Reset Token', token)
       link = 'http://localhost:8000/api/user/reset-password/'+uid+'/'+token+'/'
-      print('Password Reset Link', link)
-      # Send EMail
+      # Queue the email; send_outbox delivers it
       body = 'Click Following Link to Reset Your Password '+link
       data = {
         'subject':'Reset Your Password',
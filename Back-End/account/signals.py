@@ -0,0 +1,16 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .authentication import user_cache
+from .models import User
+
+
+def invalidate_cached_user(sender, instance, using, **kwargs):
+  # After commit, or a concurrent login could re-cache the old row under the
+  # new version. Bind the pk now: delete() clears it before the commit.
+  transaction.on_commit(partial(user_cache.invalidate, instance.pk), using=using)
+
+
+def connect_user_cache_signals():
+  post_save.connect(invalidate_cached_user, sender=User, dispatch_uid='user-cache-save')
+  post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid='user-cache-delete')
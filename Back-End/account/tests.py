@@ -1,3 +1,279 @@
-from django.test import TestCase
+import os
+import runpy
+import smtplib
+import threading
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from account import hashing
+from account.authentication import user_cache
+from account.models import EmailOutbox, User
+from account.outbox import queue_email, requeue_stale_emails
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTests(TestCase):
+  def setUp(self):
+    cache.clear()
+    user_cache.clear()
+    self.user = User.objects.create_user(email='cached@example.com', name='Cached', password='pass')
+    self.client = APIClient()
+    token = RefreshToken.for_user(self.user).access_token
+    self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+  def test_cache_hit_skips_user_query(self):
+    self.assertEqual(self.client.get('/api/user/profile/').status_code, 200)
+    with self.assertNumQueries(0):
+      response = self.client.get('/api/user/profile/')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()['email'], 'cached@example.com')
+
+  def test_save_invalidates_on_commit(self):
+    self.client.get('/api/user/profile/')
+    version = user_cache.version(self.user.pk)
+    with self.captureOnCommitCallbacks(execute=True):
+      self.user.is_active = False
+      self.user.save()
+      # Until the commit, other requests still see the old row.
+      self.assertEqual(user_cache.version(self.user.pk), version)
+    self.assertEqual(self.client.get('/api/user/profile/').status_code, 401)
+
+  def test_invalidation_during_fetch_is_not_masked(self):
+    fetch = JWTAuthentication.get_user
+
+    def fetch_then_invalidate(auth, token):
+      user = fetch(auth, token)
+      # Another request deactivates the user and commits meanwhile.
+      user_cache.invalidate(user.pk)
+      return user
+
+    with mock.patch.object(JWTAuthentication, 'get_user', autospec=True, side_effect=fetch_then_invalidate):
+      self.assertEqual(self.client.get('/api/user/profile/').status_code, 200)
+    # The entry was cached under the pre-fetch version, so it is refetched.
+    with self.assertNumQueries(1):
+      self.client.get('/api/user/profile/')
+
+  def test_shared_version_invalidates_other_workers(self):
+    self.client.get('/api/user/profile/')
+    # Another worker saved the user: only the shared version changes here.
+    User.objects.filter(pk=self.user.pk).update(name='Renamed')
+    cache.set('account:user-version:%s' % self.user.pk, 'other-worker', None)
+    self.assertEqual(self.client.get('/api/user/profile/').json()['name'], 'Renamed')
+
+  def test_queryset_update_is_bounded_by_ttl(self):
+    self.client.get('/api/user/profile/')
+    User.objects.filter(pk=self.user.pk).update(is_active=False)
+    self.assertEqual(self.client.get('/api/user/profile/').status_code, 200)
+    ttl, user_cache.ttl = user_cache.ttl, 0
+    try:
+      self.assertEqual(self.client.get('/api/user/profile/').status_code, 401)
+    finally:
+      user_cache.ttl = ttl
+
+  def test_cache_is_bounded(self):
+    size, user_cache.max_size = user_cache.max_size, 1
+    try:
+      other = User.objects.create_user(email='other@example.com', name='Other', password='pass')
+      user_cache.set(self.user.pk, self.user, user_cache.version(self.user.pk))
+      user_cache.set(other.pk, other, user_cache.version(other.pk))
+      self.assertIsNone(user_cache.get(self.user.pk))
+      self.assertEqual(user_cache.get(other.pk).pk, other.pk)
+    finally:
+      user_cache.max_size = size
+
+
+class LoginHashingTests(TestCase):
+  def setUp(self):
+    cache.clear()
+    self.user = User.objects.create_user(email='login@example.com', name='Login', password='secret')
+    self.client = APIClient()
+
+  def login(self, email='login@example.com', password='secret'):
+    return self.client.post('/api/user/login/', {'email': email, 'password': password}, format='json')
+
+  def test_login_and_registration(self):
+    self.assertEqual(self.login().status_code, 200)
+    self.assertEqual(self.login(password='wrong').status_code, 404)
+    self.assertEqual(self.login(email='nobody@example.com').status_code, 404)
+    response = self.client.post('/api/user/register/', {
+      'email': 'new@example.com', 'name': 'New', 'password': 'pw', 'password2': 'pw',
+    }, format='json')
+    self.assertEqual(response.status_code, 201)
+    self.assertTrue(User.objects.get(email='new@example.com').check_password('pw'))
+
+  def test_validation_errors_keep_envelope(self):
+    response = self.client.post('/api/user/register/', {
+      'email': 'new@example.com', 'name': 'New', 'password': 'pw', 'password2': 'other',
+    }, format='json')
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual(response.json(), {'errors': {'non_field_errors': ["Password and Confirm Password doesn't match"]}})
+    self.assertEqual(response['Content-Type'], 'application/json; charset=utf-8')
+
+  def test_inactive_user_cannot_login(self):
+    User.objects.filter(pk=self.user.pk).update(is_active=False)
+    self.assertEqual(self.login().status_code, 404)
+
+  def test_outdated_hash_is_upgraded(self):
+    hasher = PBKDF2PasswordHasher()
+    old = hasher.encode('secret', hasher.salt(), iterations=1000)
+    User.objects.filter(pk=self.user.pk).update(password=old)
+    self.assertEqual(self.login().status_code, 200)
+    self.assertNotEqual(User.objects.get(pk=self.user.pk).password, old)
+
+  def test_full_queue_is_refused(self):
+    busy = hashing.HashingExecutor(workers=1, queue_size=0, timeout=5)
+    release = threading.Event()
+    busy.submit(release.wait)
+    try:
+      with mock.patch.object(hashing, 'executor', busy):
+        response = self.login()
+    finally:
+      release.set()
+    self.assertEqual(response.status_code, 503)
+    self.assertIn('errors', response.json())
+
+  def test_pool_is_sized_below_request_threads(self):
+    config = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+    self.assertEqual(config['worker_class'], 'gthread')
+    self.assertEqual(config['threads'], settings.WEB_THREADS)
+    # Refusals must start before every request thread is waiting on a hash.
+    self.assertLess(settings.AUTH_HASHING_WORKERS + settings.AUTH_HASHING_QUEUE, settings.WEB_THREADS)
+
+  def test_login_is_throttled_per_email(self):
+    with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'login_email': '2/min'}):
+      self.assertEqual(self.login(password='wrong').status_code, 404)
+      self.assertEqual(self.login(password='wrong').status_code, 404)
+      self.assertEqual(self.login().status_code, 429)
+      # Other accounts from the same address are unaffected.
+      self.assertEqual(self.login(email='nobody@example.com').status_code, 404)
+
+  def test_login_is_throttled_per_ip(self):
+    with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'login_ip': '1/min'}):
+      self.assertEqual(self.login().status_code, 200)
+      self.assertEqual(self.login(email='nobody@example.com').status_code, 429)
+
+
+class CountingBackend(LocmemBackend):
+  """locmem backend that counts connections and rejects one address."""
+  opened = 0
+
+  def open(self):
+    CountingBackend.opened += 1
+    return super().open()
+
+  def send_messages(self, messages):
+    if any('bounce@' in to for message in messages for to in message.to):
+      raise smtplib.SMTPRecipientsRefused({'bounce@example.com': (550, b'No such user')})
+    return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='account.tests.CountingBackend')
+class EmailOutboxTests(TestCase):
+  def setUp(self):
+    cache.clear()
+    CountingBackend.opened = 0
+
+  def send_outbox(self, **options):
+    # The command closes stale connections each loop, which on Postgres would
+    # also drop the test case's transaction.
+    with mock.patch('account.management.commands.send_outbox.close_old_connections'):
+      call_command('send_outbox', once=True, stdout=mock.Mock(), stderr=mock.Mock(), **options)
+
+  def test_reset_request_only_enqueues(self):
+    User.objects.create_user(email='reset@example.com', name='Reset', password='pw')
+    with mock.patch('builtins.print') as printed:
+      response = APIClient().post('/api/user/send-reset-password-email/', {'email': 'reset@example.com'}, format='json')
+    self.assertEqual(response.status_code, 200)
+    printed.assert_not_called()
+    self.assertEqual(len(mail.outbox), 0)
+    queued = EmailOutbox.objects.get()
+    self.assertEqual(queued.to_email, 'reset@example.com')
+    self.assertIn('/api/user/reset-password/', queued.body)
+
+    self.send_outbox()
+    self.assertEqual(len(mail.outbox), 1)
+    self.assertEqual(mail.outbox[0].to, ['reset@example.com'])
+    self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+
+  def test_batch_reuses_one_connection(self):
+    for i in range(5):
+      queue_email('Subject', 'Body', f'user{i}@example.com')
+    self.send_outbox(batch_size=10)
+    self.assertEqual(len(mail.outbox), 5)
+    self.assertEqual(CountingBackend.opened, 1)
+
+  def test_failure_is_retried_with_backoff(self):
+    queue_email('Subject', 'Body', 'ok@example.com')
+    bounced = queue_email('Subject', 'Body', 'bounce@example.com')
+    before = timezone.now()
+    self.send_outbox(backoff=60, max_attempts=2)
+
+    self.assertEqual([m.to for m in mail.outbox], [['ok@example.com']])
+    bounced.refresh_from_db()
+    self.assertEqual(bounced.status, EmailOutbox.PENDING)
+    self.assertEqual(bounced.attempts, 1)
+    self.assertIn('SMTPRecipientsRefused', bounced.last_error)
+    self.assertGreaterEqual(bounced.next_attempt_at, before + timedelta(seconds=60))
+
+    # Not due yet: nothing is sent.
+    self.send_outbox(backoff=60, max_attempts=2)
+    bounced.refresh_from_db()
+    self.assertEqual(bounced.attempts, 1)
+
+    EmailOutbox.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+    self.send_outbox(backoff=60, max_attempts=2)
+    bounced.refresh_from_db()
+    self.assertEqual(bounced.status, EmailOutbox.FAILED)
+    self.assertEqual(bounced.attempts, 2)
+
+  def test_outage_reschedules_whole_batch(self):
+    emails = [queue_email('Subject', 'Body', f'user{i}@example.com') for i in range(3)]
+    with mock.patch.object(CountingBackend, 'open', side_effect=ConnectionRefusedError('smtp down')):
+      self.send_outbox(backoff=60, max_attempts=2)
+    self.assertEqual(len(mail.outbox), 0)
+    for email in emails:
+      email.refresh_from_db()
+      self.assertEqual((email.status, email.attempts), (EmailOutbox.PENDING, 1))
+      self.assertIn('smtp down', email.last_error)
+      self.assertIsNone(email.claim_token)
+
+  def test_failed_reopen_reschedules_rest_of_batch(self):
+    bounced = queue_email('Subject', 'Body', 'bounce@example.com')
+    rest = [queue_email('Subject', 'Body', f'user{i}@example.com') for i in range(2)]
+    opens = iter([True])
+
+    def open_once(backend):
+      if next(opens, None) is None:
+        raise ConnectionRefusedError('smtp down')
+
+    with mock.patch.object(CountingBackend, 'open', autospec=True, side_effect=open_once):
+      self.send_outbox(backoff=60, max_attempts=5)
+    for email in [bounced, *rest]:
+      email.refresh_from_db()
+      self.assertEqual((email.status, email.attempts), (EmailOutbox.PENDING, 1))
+    self.assertIn('smtp down', rest[0].last_error)
+
+  def test_stale_messages_count_attempts(self):
+    email = queue_email('Subject', 'Body', 'stale@example.com')
+    EmailOutbox.objects.update(status=EmailOutbox.SENDING, claimed_at=timezone.now() - timedelta(hours=1))
+    self.assertEqual(requeue_stale_emails(timedelta(minutes=10), max_attempts=2), (1, 0))
+    EmailOutbox.objects.update(status=EmailOutbox.SENDING, claimed_at=timezone.now() - timedelta(hours=1))
+    self.assertEqual(requeue_stale_emails(timedelta(minutes=10), max_attempts=2), (0, 1))
+    email.refresh_from_db()
+    self.assertEqual((email.status, email.attempts), (EmailOutbox.FAILED, 2))
+
+  def test_command_survives_aborted_batch(self):
+    queue_email('Subject', 'Body', 'user@example.com')
+    with mock.patch('account.management.commands.send_outbox.send_batch', side_effect=RuntimeError('boom')):
+      self.send_outbox()
+    self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENDING)
@@ -0,0 +1,29 @@
+import hashlib
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class IPRateThrottle(SimpleRateThrottle):
+  """Throttles by client address, authenticated or not."""
+
+  def get_cache_key(self, request, view):
+    return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginIPThrottle(IPRateThrottle):
+  scope = 'login_ip'
+
+
+class RegistrationIPThrottle(IPRateThrottle):
+  scope = 'register_ip'
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+  """Throttles attempts against one account, whichever addresses they come from."""
+  scope = 'login_email'
+
+  def get_cache_key(self, request, view):
+    email = request.data.get('email') if hasattr(request.data, 'get') else None
+    if not isinstance(email, str) or not email.strip():
+      return None
+    ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,13 +1,13 @@
-from django.core.mail import EmailMessage
 import os
+from account.outbox import queue_email
 
 class Util:
   @staticmethod
   def send_email(data):
-    email = EmailMessage(
+    # Queued only; `manage.py send_outbox` does the SMTP work.
+    return queue_email(
       subject=data['subject'],
       body=data['body'],
+      to_email=data['to_email'],
       from_email=os.environ.get('EMAIL_FROM'),
-      to=[data['to_email']]
     )
-    email.send()
\ No newline at end of file
@@ -3,7 +3,8 @@ from rest_framework import status
 from rest_framework.views import APIView
 from account.serializers import UserRegistrationSerializer,UserLoginSerializer,UserProfileSerializer,UserChangePasswordSerializer,SendPasswordResetEmailSerializer,UserPasswordResetSerializer
 from account.renderers import UserRenderer
-from django.contrib.auth import authenticate
+from account.hashing import authenticate_user
+from account.throttles import LoginEmailThrottle, LoginIPThrottle, RegistrationIPThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 
@@ -17,6 +18,7 @@ def get_tokens_for_user(user):
 
 class UserRegistrationView(APIView):
   renderer_classes = [UserRenderer]
+  throttle_classes = [RegistrationIPThrottle]
   def post(self,request,format=None):
     serializer = UserRegistrationSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -27,12 +29,13 @@ class UserRegistrationView(APIView):
 
 class UserLoginView(APIView):
   renderer_classes = [UserRenderer]
+  throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
   def post(self, request, format=None):
     serializer = UserLoginSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     email = serializer.data.get('email')
     password = serializer.data.get('password')
-    user = authenticate(email=email, password=password)
+    user = authenticate_user(email, password)
     if user is not None:
       token = get_tokens_for_user(user)
       return Response({'token':token,'msg':'Login Success'}, status=status.HTTP_200_OK)
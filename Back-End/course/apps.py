@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CourseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'course'
+
+    def ready(self):
+        from .signals import connect_catalog_signals, connect_storage_signals
+        connect_catalog_signals()
+        connect_storage_signals()
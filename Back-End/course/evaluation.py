@@ -0,0 +1,217 @@
+"""
+Evaluation harness for prompt submissions.
+
+A submission's ``prompt_text`` is run against every ``TestCase`` of its task
+through a ``ModelClient`` (``get_model_client()`` picks one from settings).
+Submissions created through the API are queued like file submissions and
+evaluated by ``grade_worker`` (``evaluate_runs``); ``evaluate_prompts``
+re-evaluates whole tasks on demand. Completions are cached in
+``ModelResponse`` under ``sha256(model, prompt, input)``, and identical calls
+within one run are sent only once, so re-evaluating a cohort only pays for
+prompts that actually changed. Database work happens before and after the
+event loop; only model calls run concurrently, bounded by a semaphore.
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .grading import AUTO_GRADABLE
+from .mock_model_server import mock_completion
+from .models import GradingRun, ModelResponse, Submission, TestCase
+
+LOOKUP_BATCH_SIZE = 500
+
+
+class ModelClient(abc.ABC):
+    """Returns ``model``'s completion of ``prompt``; passed to ``evaluate_submissions``."""
+
+    @abc.abstractmethod
+    async def complete(self, model, prompt):
+        """The completion text; exceptions mark the test case as errored."""
+
+
+class HTTPModelClient(ModelClient):
+    """Client for OpenAI-compatible ``/v1/chat/completions`` endpoints."""
+
+    def __init__(self, base_url, api_key='', timeout=60):
+        self.url = base_url.rstrip('/') + '/v1/chat/completions'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    async def complete(self, model, prompt):
+        return await asyncio.get_running_loop().run_in_executor(None, self.post, model, prompt)
+
+    def post(self, model, prompt):
+        body = json.dumps({'model': model, 'messages': [{'role': 'user', 'content': prompt}]}).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = json.load(response)
+        return payload['choices'][0]['message']['content']
+
+
+class MockModelClient(ModelClient):
+    """In-process stand-in for the mock model server."""
+
+    async def complete(self, model, prompt):
+        return mock_completion(prompt)
+
+
+def get_model_client():
+    if settings.EVALUATION_BASE_URL:
+        return HTTPModelClient(settings.EVALUATION_BASE_URL, settings.EVALUATION_API_KEY, settings.EVALUATION_TIMEOUT)
+    return MockModelClient()
+
+
+def build_prompt(prompt_text, input_text):
+    if '{input}' in prompt_text:
+        return prompt_text.replace('{input}', input_text)
+    return f'{prompt_text}\n{input_text}'
+
+
+def response_key(model, prompt_text, input_text):
+    return hashlib.sha256(json.dumps([model, prompt_text, input_text]).encode()).hexdigest()
+
+
+def normalize_response(text):
+    return ' '.join(text.split())
+
+
+def response_matches(response, expected):
+    # Whole answer, like compare_output in the sandbox; only whitespace is
+    # normalized, so "14" or "not 4" never pass for "4".
+    return normalize_response(response) == normalize_response(expected)
+
+
+@dataclass
+class EvaluationStats:
+    submissions: int = 0
+    lookups: int = 0
+    cache_hits: int = 0
+    deduplicated: int = 0
+    model_calls: int = 0
+    errors: int = 0
+
+    @property
+    def hit_rate(self):
+        return (self.cache_hits + self.deduplicated) / self.lookups if self.lookups else 0.0
+
+
+async def fetch_completions(client, model, prompts, concurrency):
+    """``prompts`` maps cache key -> prompt. Returns key -> completion or exception."""
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+    async def fetch(key, prompt):
+        async with semaphore:
+            try:
+                return key, await client.complete(model, prompt)
+            except Exception as exc:
+                return key, exc
+
+    return dict(await asyncio.gather(*(fetch(key, prompt) for key, prompt in prompts.items())))
+
+
+def cached_responses(keys):
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        batch = keys[start:start + LOOKUP_BATCH_SIZE]
+        found.update(ModelResponse.objects.filter(key__in=batch).values_list('key', 'response'))
+    return found
+
+
+def evaluate_submissions(submissions, client=None, model=None, concurrency=None, runs=None):
+    """
+    Evaluates prompt submissions, records a ``GradingRun`` for each and writes
+    ``Submission.grade``. ``runs`` maps submission id to an already claimed
+    run to complete instead of creating one. Returns ``EvaluationStats``.
+    """
+    runs = runs or {}
+    client = client or get_model_client()
+    model = model or settings.EVALUATION_MODEL
+    concurrency = concurrency or settings.EVALUATION_CONCURRENCY
+    stats = EvaluationStats()
+
+    submissions = [submission for submission in submissions if submission.prompt_text]
+    testcases = {}
+    for testcase in TestCase.objects.filter(task_id__in={s.task_id for s in submissions}):
+        testcases.setdefault(testcase.task_id, []).append(testcase)
+
+    calls = {}
+    for submission in submissions:
+        for testcase in testcases.get(submission.task_id, []):
+            key = response_key(model, submission.prompt_text, testcase.input_text)
+            calls.setdefault(key, []).append((submission, testcase))
+            stats.lookups += 1
+
+    responses = cached_responses(calls)
+    stats.cache_hits = sum(len(calls[key]) for key in responses)
+    missing = {
+        key: build_prompt(uses[0][0].prompt_text, uses[0][1].input_text)
+        for key, uses in calls.items() if key not in responses
+    }
+    stats.model_calls = len(missing)
+    stats.deduplicated = sum(len(calls[key]) - 1 for key in missing)
+
+    fetched = asyncio.run(fetch_completions(client, model, missing, concurrency)) if missing else {}
+    fresh = {key: value for key, value in fetched.items() if not isinstance(value, Exception)}
+    stats.errors = len(fetched) - len(fresh)
+    responses.update(fresh)
+
+    finished, graded = [], {}
+    now = timezone.now()
+    for submission in submissions:
+        tests, passed, total, errors = [], 0, 0, []
+        for index, testcase in enumerate(testcases.get(submission.task_id, [])):
+            key = response_key(model, submission.prompt_text, testcase.input_text)
+            response = responses.get(key)
+            if response is None:
+                errors.append(f'test {index}: {fetched.get(key)!r}')
+                continue
+            ok = response_matches(response, testcase.expected_output)
+            total += testcase.weight
+            passed += testcase.weight if ok else 0
+            tests.append({'index': index, 'status': 'passed' if ok else 'failed', 'response': response,
+                          'cached': key not in fresh})
+        score = 100.0 * passed / total if total and not errors else None
+        run = runs.get(submission.pk) or GradingRun(submission=submission, attempts=1, claimed_at=now)
+        run.status = GradingRun.FAILED if errors else GradingRun.DONE
+        run.score, run.report, run.error = score, {'model': model, 'tests': tests}, '\n'.join(errors)
+        run.finished_at = now
+        finished.append(run)
+        if score is not None:
+            graded.setdefault(round(score), []).append(submission.pk)
+        stats.submissions += 1
+
+    with transaction.atomic():
+        ModelResponse.objects.bulk_create(
+            [ModelResponse(key=key, model=model, response=response) for key, response in fresh.items()],
+            ignore_conflicts=True,
+        )
+        hit_keys = [key for key in calls if key not in fresh and key in responses]
+        for start in range(0, len(hit_keys), LOOKUP_BATCH_SIZE):
+            ModelResponse.objects.filter(key__in=hit_keys[start:start + LOOKUP_BATCH_SIZE]).update(hits=F('hits') + 1)
+        GradingRun.objects.bulk_create([run for run in finished if run.pk is None])
+        GradingRun.objects.bulk_update([run for run in finished if run.pk is not None],
+                                       ['status', 'score', 'report', 'error', 'finished_at'])
+        for grade, ids in graded.items():
+            for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+                Submission.objects.filter(AUTO_GRADABLE, pk__in=ids[start:start + LOOKUP_BATCH_SIZE]).update(
+                    grade=grade, auto_graded=True)
+    return stats
+
+
+def evaluate_runs(runs, client=None):
+    """Completes claimed grading runs of prompt submissions; used by ``grade_worker``."""
+    return evaluate_submissions([run.submission for run in runs], client, runs={run.submission_id: run for run in runs})
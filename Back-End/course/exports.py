@@ -0,0 +1,52 @@
+import csv
+import json
+
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('user_email', 'user__email'),
+    ('user_name', 'user__name'),
+    ('task_id', 'task_id'),
+    ('task_title', 'task__title'),
+    ('file', 'file'),
+    ('submitted_at', 'submitted_at'),
+    ('grade', 'grade'),
+]
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_rows(queryset, chunk_size):
+    """
+    Yields plain tuples in ``EXPORT_COLUMNS`` order. ``iterator()`` uses a
+    server-side cursor on Postgres, so only ``chunk_size`` rows are in memory.
+    """
+    rows = queryset.order_by('submitted_at', 'id').values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+    for row in rows.iterator(chunk_size=chunk_size):
+        # submitted_at is the only non-JSON-native column.
+        yield row[:6] + (row[6].isoformat(),) + row[7:]
+
+
+def batched(lines, size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_ndjson(rows, batch_size=500):
+    dumps = json.dumps
+    return batched((dumps(dict(zip(HEADER, row))) + '\n' for row in rows), batch_size)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, batch_size=500):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    yield from batched((writer.writerow(row) for row in rows), batch_size)
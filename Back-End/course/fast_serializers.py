@@ -0,0 +1,216 @@
+"""
+Read-only fast path for the course serializers.
+
+``compile_serializer`` turns a ``ModelSerializer`` class into a
+``CompiledSerializer`` that builds response rows straight from
+``QuerySet.values()`` dicts: no model instances, no per-field
+``get_attribute`` walk. Field order, names and converters are taken from the
+DRF serializer itself, so the rendered JSON is byte-identical to
+``serializer.data``. Reverse relations declared as nested ``many=True``
+serializers are loaded with one ``values()`` query each, like
+``prefetch_related`` would.
+
+Serializers using anything that needs a model instance (method fields,
+dotted sources, nested single objects, ...) are not compiled, and
+``CompiledReadMixin`` falls back to the regular DRF path for them.
+"""
+import datetime
+import functools
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import BasePermission
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() is the identity on values() output.
+IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def iso_datetime(value):
+    if value.utcoffset():
+        value = value.astimezone(datetime.timezone.utc)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return None
+    current = timezone.get_current_timezone()
+    utc = current is datetime.timezone.utc or getattr(current, 'key', None) == 'UTC'
+    if (output_format.lower() == ISO_8601 and settings.USE_TZ and utc
+            and getattr(field, 'timezone', None) is None):
+        return iso_datetime
+    return field.to_representation
+
+
+def file_converter(field, storage, request):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return None
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+class CompiledSerializer:
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.entries = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.entries.append(('nested', name) + self.compile_nested(field))
+            elif isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) \
+                    or field.source == '*' or '.' in field.source:
+                raise NotCompilable(f'{type(serializer).__name__}.{name}')
+            else:
+                self.entries.append(('column', name, field.source, field))
+        self.sources = [entry[2] for entry in self.entries if entry[0] == 'column']
+        self.build_factory = self.generate()
+
+    def compile_nested(self, field):
+        relation = self.model._meta.get_field(field.source)
+        if not relation.one_to_many:
+            raise NotCompilable(field.source)
+        return CompiledSerializer(field.child), relation.field.name
+
+    def generate(self):
+        """
+        Writes the row builder as Python source, one dict display per row, so
+        the per-row cost is a handful of subscripts and calls. Converters that
+        depend on the request are bound per call through the factory.
+        """
+        arguments, items = [], []
+        for index, entry in enumerate(self.entries):
+            if entry[0] == 'nested':
+                arguments.append(f'n{index}')
+                items.append(f'{entry[1]!r}: n{index}.get(row[{self.pk!r}], [])')
+            elif self.is_identity(entry[3]):
+                items.append(f'{entry[1]!r}: row[{entry[2]!r}]')
+            elif hasattr(entry[3], 'download_url'):
+                # DownloadFileField: the URL is built from the row's pk.
+                arguments.append(f'c{index}')
+                items.append(f'{entry[1]!r}: c{index}(row[{self.pk!r}]) if row[{entry[2]!r}] else None')
+            else:
+                arguments.append(f'c{index}')
+                value = f'row[{entry[2]!r}]'
+                items.append(f'{entry[1]!r}: {value} if c{index} is None or {value} is None else c{index}({value})')
+        source = (
+            f'def factory({", ".join(arguments)}):\n'
+            f'    def build(row):\n'
+            f'        return {{{", ".join(items)}}}\n'
+            f'    return build\n'
+        )
+        namespace = {}
+        exec(compile(source, f'<compiled {self.model.__name__} serializer>', 'exec'), namespace)
+        return namespace['factory']
+
+    def is_identity(self, field):
+        if isinstance(field, PrimaryKeyRelatedField):
+            return field.pk_field is None
+        return isinstance(field, IDENTITY_FIELDS)
+
+    def converter(self, source, field, request):
+        if hasattr(field, 'download_url'):
+            return functools.partial(field.download_url, request=request)
+        if isinstance(field, PrimaryKeyRelatedField):
+            return field.pk_field.to_representation
+        if isinstance(field, serializers.FileField):
+            return file_converter(field, self.model._meta.get_field(source).storage, request)
+        if isinstance(field, serializers.DateTimeField):
+            return datetime_converter(field)
+        return field.to_representation
+
+    def values(self, queryset, *extra):
+        fields = list(self.sources)
+        for name in (self.pk, *extra):
+            if name not in fields:
+                fields.append(name)
+        return queryset.prefetch_related(None).values(*fields)
+
+    def serialize(self, rows, request=None):
+        rows = list(rows)
+        arguments = []
+        for entry in self.entries:
+            if entry[0] == 'nested':
+                arguments.append(self.load_nested(entry[2], entry[3], rows, request))
+            elif not self.is_identity(entry[3]):
+                arguments.append(self.converter(entry[2], entry[3], request))
+        build = self.build_factory(*arguments)
+        return [build(row) for row in rows]
+
+    def load_nested(self, child, foreign_key, rows, request):
+        keys = [row[self.pk] for row in rows]
+        if not keys:
+            return {}
+        queryset = child.model._default_manager.filter(**{f'{foreign_key}__in': keys})
+        child_rows = list(child.values(queryset, foreign_key))
+        grouped = {}
+        for child_row, data in zip(child_rows, child.serialize(child_rows, request)):
+            grouped.setdefault(child_row[foreign_key], []).append(data)
+        return grouped
+
+
+_compiled = {}
+
+
+def compile_serializer(serializer_class):
+    """Returns the cached ``CompiledSerializer`` for a class, or None if it can't be compiled."""
+    if serializer_class not in _compiled:
+        try:
+            _compiled[serializer_class] = CompiledSerializer(serializer_class())
+        except NotCompilable:
+            _compiled[serializer_class] = None
+    return _compiled[serializer_class]
+
+
+class CompiledReadMixin:
+    """
+    Serves ``list`` and ``retrieve`` through ``compile_serializer``.
+    Retrieve keeps the regular path when a permission class implements
+    object-level checks, since those need the model instance.
+    """
+
+    def get_compiled_serializer(self):
+        return compile_serializer(self.get_serializer_class())
+
+    def has_object_permission_checks(self):
+        return any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page, request))
+        return Response(compiled.serialize(queryset, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None or self.has_object_permission_checks():
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(compiled.serialize([row], request)[0])
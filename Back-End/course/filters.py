@@ -0,0 +1,27 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+
+class SubmissionFilter(BaseFilterBackend):
+    """Filters submissions by ``?task=``, ``?user=`` and ``?graded=true|false``."""
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        for param in ('task', 'user'):
+            value = params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: ['A valid integer is required.']})
+                queryset = queryset.filter(**{f'{param}_id': int(value)})
+
+        graded = params.get('graded', '').lower()
+        if graded in TRUE_VALUES:
+            queryset = queryset.filter(grade__isnull=False)
+        elif graded in FALSE_VALUES:
+            queryset = queryset.filter(grade__isnull=True)
+        elif graded:
+            raise ValidationError({'graded': ['Must be true or false.']})
+        return queryset
@@ -0,0 +1,133 @@
+import os
+import socket
+import sys
+import uuid
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import GradingRun, Submission, Task, TestCase
+from .sandbox import Limits, Runner, private_copy
+
+
+def enqueue_grading(submission):
+    """
+    Queues a submission for the grade workers; a single INSERT, never blocks
+    on grading. Files run in the sandbox, prompt-only submissions go through
+    course.evaluation.
+    """
+    if submission.file or submission.prompt_text:
+        return GradingRun.objects.create(submission=submission)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_runs(limit, worker=None):
+    """
+    Atomically moves up to ``limit`` pending runs to RUNNING and returns them.
+
+    On backends with ``SELECT ... FOR UPDATE SKIP LOCKED`` (Postgres) workers
+    never wait on each other's rows. SQLite has no row locks, but it runs a
+    single UPDATE atomically, so the claim is one ``UPDATE ... WHERE id IN
+    (SELECT ...)`` tagged with a fresh token that identifies the winner.
+    """
+    token = uuid.uuid4()
+    pending = GradingRun.objects.filter(status=GradingRun.PENDING).order_by('created_at', 'id')
+    claim = dict(status=GradingRun.RUNNING, claim_token=token, worker=worker or worker_name(),
+                 claimed_at=timezone.now(), attempts=F('attempts') + 1)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            GradingRun.objects.filter(id__in=ids).update(**claim)
+    else:
+        GradingRun.objects.filter(
+            id__in=pending.values('id')[:limit], status=GradingRun.PENDING,
+        ).update(**claim)
+    return list(GradingRun.objects.filter(claim_token=token).select_related('submission'))
+
+
+def requeue_stale_runs(timeout, max_attempts):
+    """Returns runs whose worker vanished to the queue, or fails them after ``max_attempts``."""
+    cutoff = timezone.now() - timeout
+    stale = GradingRun.objects.filter(status=GradingRun.RUNNING, claimed_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=GradingRun.FAILED, error='Worker did not finish the run.', finished_at=timezone.now())
+    requeued = stale.update(status=GradingRun.PENDING, claim_token=None)
+    return requeued, failed
+
+
+def build_jobs(runs):
+    """Turns claimed runs into plain picklable dicts for the process pool."""
+    task_ids = {run.submission.task_id for run in runs}
+    thresholds = dict(Task.objects.filter(pk__in=task_ids).values_list('pk', 'pass_threshold'))
+    testcases = {}
+    for testcase in TestCase.objects.filter(task_id__in=task_ids):
+        testcases.setdefault(testcase.task_id, []).append({
+            'input': testcase.input_text,
+            'expected': testcase.expected_output,
+            'weight': testcase.weight,
+        })
+    return [{
+        'run_id': run.pk,
+        'path': run.submission.file.path,
+        'testcases': testcases.get(run.submission.task_id, []),
+        'pass_threshold': thresholds.get(run.submission.task_id),
+    } for run in runs]
+
+
+def grading_limits():
+    return Limits(
+        cpu_seconds=settings.GRADING_CPU_SECONDS,
+        wall_seconds=settings.GRADING_WALL_SECONDS,
+        memory_bytes=settings.GRADING_MEMORY_MB * 1024 * 1024,
+        output_bytes=settings.GRADING_OUTPUT_KB * 1024,
+        processes=settings.GRADING_MAX_PROCESSES,
+    )
+
+
+def run_job(job):
+    """
+    Runs a submission against its test cases in the sandbox. Executed in a
+    worker process, so it must not touch the database. Returns
+    ``(score, report)`` with the score as a 0-100 percentage of passed weight.
+    The program runs on a private copy, never next to other students' blobs.
+    """
+    user = settings.GRADING_SANDBOX_USER
+    with private_copy(job['path'], user=user) as path:
+        runner = Runner(
+            [sys.executable, path],
+            limits=grading_limits(),
+            max_workers=settings.GRADING_TEST_PARALLELISM,
+            pass_threshold=job['pass_threshold'],
+            cwd=os.path.dirname(path),
+            user=user,
+        )
+        report = runner.run(job['testcases'])
+    return report.score, report.as_dict()
+
+
+# Submissions the grade worker may grade: ungraded, or graded by it before.
+AUTO_GRADABLE = Q(grade__isnull=True) | Q(auto_graded=True)
+
+
+def finish_run(run_id, score=None, report=None, error=''):
+    """
+    Records a run's outcome and, with a score, the submission's grade unless
+    staff graded it. Returns None when the run (or its submission) was
+    deleted while it ran.
+    """
+    try:
+        run = GradingRun.objects.get(pk=run_id)
+    except GradingRun.DoesNotExist:
+        return None
+    run.score, run.report, run.error = score, report, error
+    run.status = GradingRun.FAILED if error else GradingRun.DONE
+    run.finished_at = timezone.now()
+    with transaction.atomic():
+        run.save(update_fields=['score', 'report', 'error', 'status', 'finished_at'])
+        if score is not None:
+            Submission.objects.filter(AUTO_GRADABLE, pk=run.submission_id).update(grade=round(score), auto_graded=True)
+    return run
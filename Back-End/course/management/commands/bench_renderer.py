@@ -0,0 +1,69 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from AiAgentWeb.fast_json import FastJSONRenderer, orjson
+
+STAMP = '2025-01-02T03:04:05.678901Z'
+
+
+def legacy_user_renderer(data):
+    # What account.renderers.UserRenderer used to do for every response.
+    if 'ErrorDetail' in str(data):
+        return json.dumps({'errors': data}).encode()
+    return json.dumps(data).encode()
+
+
+def topic_payload(topics, children):
+    return [{
+        'id': t, 'title': f'Topic {t}', 'description': 'Agents and planning. ' * 5,
+        'videos': [{'id': v, 'title': f'Video {v}', 'video_url': 'https://example.com/v', 'created_at': STAMP,
+                    'updated_at': STAMP, 'topic': t} for v in range(children)],
+        'tasks': [{'id': k, 'title': f'Task {k}', 'description': 'Write a planner.', 'attachment': None,
+                   'created_at': STAMP, 'updated_at': STAMP, 'topic': t, 'creator': 1} for k in range(children)],
+    } for t in range(topics)]
+
+
+def submission_payload(rows):
+    return {'next': None, 'previous': None, 'results': [{
+        'id': i, 'file': f'https://example.com/media/blobs/{i:064x}.py', 'prompt_text': '',
+        'submitted_at': STAMP, 'grade': i % 100, 'task': i % 500, 'user': i % 5000,
+    } for i in range(rows)]}
+
+
+class Command(BaseCommand):
+    help = 'Compares render time of the old UserRenderer, DRF JSONRenderer and FastJSONRenderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topics', type=int, default=200)
+        parser.add_argument('--children', type=int, default=20, help='Videos and tasks per topic.')
+        parser.add_argument('--submissions', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5, help='Best of N runs.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'orjson: {"yes" if orjson else "not installed, stock json path"}')
+        renderers = [
+            ('legacy UserRenderer', legacy_user_renderer),
+            ('DRF JSONRenderer', JSONRenderer().render),
+            ('FastJSONRenderer', FastJSONRenderer().render),
+        ]
+        payloads = [
+            ('topics', topic_payload(options['topics'], options['children'])),
+            ('submissions', submission_payload(options['submissions'])),
+        ]
+        for name, data in payloads:
+            size = len(FastJSONRenderer().render(data))
+            self.stdout.write(f'{name}: {size / 1024 / 1024:.1f} MiB')
+            baseline = None
+            for label, render in renderers:
+                elapsed = self.best(options['repeat'], render, data)
+                baseline = baseline or elapsed
+                self.stdout.write(f'  {label:<20} {elapsed * 1000:8.1f} ms  x{baseline / elapsed:.1f}')
+
+    def best(self, repeat, render, data):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render(data)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
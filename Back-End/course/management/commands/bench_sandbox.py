@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from course.sandbox import Limits, Runner
+
+PROGRAM = 'import sys\nprint(sum(int(x) for x in sys.stdin.read().split()))\n'
+
+
+class Command(BaseCommand):
+    help = 'Measures sandboxed test cases per second for increasing worker counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tests', type=int, default=200, help='Test cases per measurement.')
+        parser.add_argument('--workers', type=int, nargs='*',
+                            help='Worker counts to measure (default: 1, 2, 4, ... up to the CPU count).')
+
+    def handle(self, *args, **options):
+        cpus = os.cpu_count() or 1
+        workers = options['workers'] or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+        testcases = [{'input': f'{i} {i}', 'expected': str(2 * i)} for i in range(options['tests'])]
+
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as fh:
+            fh.write(PROGRAM)
+        try:
+            self.stdout.write(f'{len(testcases)} test cases, {cpus} CPU(s)')
+            baseline = None
+            for count in workers:
+                runner = Runner([sys.executable, fh.name], limits=Limits(), max_workers=count)
+                started = time.perf_counter()
+                report = runner.run(testcases)
+                elapsed = time.perf_counter() - started
+                rate = len(testcases) / elapsed
+                baseline = baseline or rate
+                self.stdout.write(
+                    f'workers={count:<3} {rate:8.1f} tests/s  speedup x{rate / baseline:.2f}  '
+                    f'score={report.score:.0f}'
+                )
+        finally:
+            os.remove(fh.name)
@@ -0,0 +1,71 @@
+import time
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from account.models import User
+from course.fast_serializers import compile_serializer
+from course.models import Submission, Task, Topic, Video
+from course.serializers import SubmissionSerializer, TaskSerializer, TopicSerializer, VideoSerializer
+
+
+class Command(BaseCommand):
+    help = ('Compares objects per second of the DRF serializers and the compiled read path, '
+            'query included, on synthetic rows that are rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Rows per model.')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = Request(APIRequestFactory().get('/'))
+        with transaction.atomic():
+            storage, name = self.seed(rows)
+            cases = [
+                ('video', VideoSerializer, Video.objects.all()),
+                ('task', TaskSerializer, Task.objects.all()),
+                ('submission', SubmissionSerializer, Submission.objects.all()),
+                ('topic+nested', TopicSerializer, Topic.objects.prefetch_related('videos', 'tasks')),
+            ]
+            try:
+                for label, serializer_class, queryset in cases:
+                    compiled = compile_serializer(serializer_class)
+                    count = queryset.count()
+                    drf = self.best(options['repeat'], lambda: serializer_class(
+                        queryset.all(), many=True, context={'request': request}).data)
+                    fast = self.best(options['repeat'], lambda: compiled.serialize(
+                        compiled.values(queryset.all()), request))
+                    self.stdout.write(
+                        f'{label:<13} {count:>7} objects  drf {count / drf:>10.0f}/s  '
+                        f'compiled {count / fast:>10.0f}/s  x{drf / fast:.1f}'
+                    )
+            finally:
+                # The rollback below does not undo the blob written to disk.
+                storage.delete(name)
+            transaction.set_rollback(True)
+
+    def best(self, repeat, fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def seed(self, rows):
+        user = User.objects.create(email='bench-serializers@example.invalid', name='Bench')
+        topics = Topic.objects.bulk_create(Topic(title=f'Topic {i}') for i in range(max(1, rows // 50)))
+        Video.objects.bulk_create(
+            Video(topic=topics[i % len(topics)], title=f'Video {i}', video_url='https://example.com/v')
+            for i in range(rows))
+        tasks = Task.objects.bulk_create(
+            Task(topic=topics[i % len(topics)], title=f'Task {i}', description='...', creator=user)
+            for i in range(rows))
+        storage = Submission._meta.get_field('file').storage
+        name = storage.save('bench.py', ContentFile(b'print(1)'))
+        Submission.objects.bulk_create(
+            Submission(task=tasks[i % len(tasks)], user=user, file=name, grade=i % 100)
+            for i in range(rows))
+        return storage, name
@@ -0,0 +1,73 @@
+import argparse
+import io
+import os
+import sys
+import time
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from AiAgentWeb import boot
+
+
+class Command(BaseCommand):
+    help = ('Container start-up: under an advisory lock, runs migrate, collectstatic and export_openapi '
+            'only when their inputs changed, then execs the given server command, e.g. '
+            '`manage.py boot -- gunicorn -c gunicorn.conf.py AiAgentWeb.wsgi:application`.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--force', action='store_true', help='Run every step regardless of fingerprints.')
+        parser.add_argument('server', nargs=argparse.REMAINDER, help='Command to exec once boot is done.')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        self.force = options['force']
+        with boot.boot_lock(options['database']):
+            locked = time.time()
+            self.stdout.write(f'lock acquired in {locked - started:.2f}s')
+            state = boot.load_state()
+            self.step('migrate', self.migrate, options['database'])
+            self.step('collectstatic', self.collectstatic, state)
+            self.step('openapi', self.export_openapi, state)
+            boot.save_state(state)
+        self.stdout.write(self.style.SUCCESS(f'boot done in {time.time() - started:.2f}s'))
+
+        server = options['server']
+        if server and server[0] == '--':
+            server = server[1:]
+        if server:
+            os.environ.setdefault(boot.STARTED_ENV, str(started))
+            connections.close_all()
+            sys.stdout.flush()
+            try:
+                os.execvp(server[0], server)
+            except OSError as exc:
+                raise CommandError(f'Cannot exec {server[0]}: {exc}')
+
+    def step(self, name, function, *args):
+        started = time.perf_counter()
+        ran = function(*args)
+        self.stdout.write(f'{name:<14} {"done" if ran else "up to date":<11} {time.perf_counter() - started:.2f}s')
+
+    def migrate(self, alias):
+        if not self.force and not boot.pending_migrations(alias):
+            return False
+        call_command('migrate', database=alias, interactive=False, verbosity=0)
+        return True
+
+    def collectstatic(self, state):
+        fingerprint = boot.static_fingerprint()
+        if not self.force and state.get('static') == fingerprint:
+            return False
+        call_command('collectstatic', interactive=False, verbosity=0)
+        state['static'] = fingerprint
+        return True
+
+    def export_openapi(self, state):
+        fingerprint = boot.source_fingerprint()
+        if not self.force and state.get('openapi') == fingerprint and os.path.exists(settings.OPENAPI_SCHEMA_FILE):
+            return False
+        call_command('export_openapi', stdout=io.StringIO())
+        state['openapi'] = fingerprint
+        return True
@@ -0,0 +1,40 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from course.models import ChunkedUpload
+from course.uploads import discard_partial
+
+
+class Command(BaseCommand):
+    help = 'Deletes resumable uploads that have been idle longer than CHUNKED_UPLOAD_EXPIRY, and orphaned partial files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - settings.CHUNKED_UPLOAD_EXPIRY
+
+        # Finished uploads keep their row for reference; only the partial file goes.
+        stale = ChunkedUpload.objects.filter(updated_at__lt=cutoff, status=ChunkedUpload.UPLOADING)
+        count = 0
+        for upload in stale.iterator():
+            count += 1
+            if not dry_run:
+                discard_partial(upload)
+                upload.delete()
+
+        orphans = 0
+        if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+            live = {f'{pk}.part' for pk in ChunkedUpload.objects.filter(
+                status=ChunkedUpload.UPLOADING).values_list('pk', flat=True)}
+            for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+                if entry.name in live or entry.stat().st_mtime > cutoff.timestamp():
+                    continue
+                orphans += 1
+                if not dry_run:
+                    os.remove(entry.path)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count} stale upload(s) and {orphans} orphaned partial file(s).'))
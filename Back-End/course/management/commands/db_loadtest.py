@@ -0,0 +1,80 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from AiAgentWeb.db_pool import pool_stats
+from course.models import Topic
+
+
+class Command(BaseCommand):
+    help = ('Simulates requests that each run a few catalog queries and reports latency with a fresh '
+            'connection per request versus the configured pool / persistent connections.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per mode.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads.')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per simulated request.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        vendor = connections[alias].vendor
+        pooled = pool_stats(alias) is not None
+        self.stdout.write(f'{alias} ({vendor}), pooled: {pooled}, {options["concurrency"]} clients')
+        results = {}
+        for mode in ('connect', 'reuse'):
+            results[mode] = self.run(mode, alias, options)
+            latencies, elapsed = results[mode]
+            self.stdout.write(
+                f'{mode:<8} {len(latencies) / elapsed:8.0f} req/s  '
+                f'p50={self.percentile(latencies, 50):6.2f}ms  p95={self.percentile(latencies, 95):6.2f}ms  '
+                f'p99={self.percentile(latencies, 99):6.2f}ms'
+            )
+        if pooled:
+            self.stdout.write(f'pool: {pool_stats(alias)}')
+        speedup = statistics.median(results['connect'][0]) / statistics.median(results['reuse'][0])
+        self.stdout.write(self.style.SUCCESS(f'median latency x{speedup:.1f} lower when reusing connections'))
+
+    def run(self, mode, alias, options):
+        """
+        "connect" opens a fresh, unpooled connection for every request, which
+        is what a plain gunicorn worker without CONN_MAX_AGE does. "reuse"
+        goes through the configured alias and ends each request the way
+        Django's request_finished handler does, so pooled and persistent
+        connections are reused.
+        """
+        sql, params = Topic.objects.only('id', 'title')[:10].query.sql_with_params()
+        primary = connections[alias]
+        fresh_settings = {**primary.settings_dict, 'CONN_MAX_AGE': 0,
+                          'OPTIONS': {k: v for k, v in primary.settings_dict['OPTIONS'].items() if k != 'pool'}}
+        latencies = []
+        lock = threading.Lock()
+
+        def request(_):
+            started = time.perf_counter()
+            if mode == 'connect':
+                connection = type(primary)(dict(fresh_settings), alias=f'{alias}-loadtest')
+            else:
+                connection = connections[alias]
+            with connection.cursor() as cursor:
+                for _ in range(options['queries']):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+            if mode == 'connect':
+                connection.close()
+            else:
+                connection.close_if_unusable_or_obsolete()
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(request, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    def percentile(self, values, pct):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,45 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from course.evaluation import HTTPModelClient, evaluate_submissions, get_model_client
+from course.models import Submission
+
+
+class Command(BaseCommand):
+    help = 'Evaluates prompt submissions against their test cases, reusing cached model responses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=int, action='append', help='Task id (repeatable).')
+        parser.add_argument('--submission', type=int, action='append', help='Submission id (repeatable).')
+        parser.add_argument('--latest', action='store_true', help="Only each user's latest submission per task.")
+        parser.add_argument('--model', default=settings.EVALUATION_MODEL)
+        parser.add_argument('--base-url', default=settings.EVALUATION_BASE_URL,
+                            help='OpenAI-compatible endpoint, e.g. the mock_model_server.')
+        parser.add_argument('--concurrency', type=int, default=settings.EVALUATION_CONCURRENCY)
+
+    def handle(self, *args, **options):
+        if not options['task'] and not options['submission']:
+            raise CommandError('Pass at least one --task or --submission.')
+        submissions = Submission.objects.exclude(prompt_text='')
+        if options['task']:
+            submissions = submissions.filter(task_id__in=options['task'])
+        if options['submission']:
+            submissions = submissions.filter(pk__in=options['submission'])
+        submissions = list(submissions.order_by('user_id', 'task_id', '-submitted_at', '-id'))
+        if options['latest']:
+            latest = {}
+            for submission in submissions:
+                latest.setdefault((submission.user_id, submission.task_id), submission)
+            submissions = list(latest.values())
+
+        client = HTTPModelClient(options['base_url'], settings.EVALUATION_API_KEY, settings.EVALUATION_TIMEOUT) \
+            if options['base_url'] else get_model_client()
+        started = time.perf_counter()
+        stats = evaluate_submissions(submissions, client, options['model'], options['concurrency'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Evaluated {stats.submissions} submission(s) in {elapsed:.2f}s: {stats.lookups} test run(s), '
+            f'{stats.cache_hits} cache hit(s), {stats.deduplicated} deduplicated, {stats.model_calls} model call(s), '
+            f'{stats.errors} error(s). Hit rate {stats.hit_rate:.1%}.'
+        ))
@@ -0,0 +1,30 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from AiAgentWeb.api_docs import encode_schema, generate_schema
+
+
+class Command(BaseCommand):
+    help = ('Writes the OpenAPI document to OPENAPI_SCHEMA_FILE (or --output), where nginx serves it as '
+            '/swagger/openapi.json. Run at deploy time, after collectstatic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Target file; a .yaml/.yml suffix writes YAML. Defaults to OPENAPI_SCHEMA_FILE.')
+        parser.add_argument('--url', default=None,
+                            help='Base URL to embed (e.g. https://iut-aiagent.ir). Defaults to OPENAPI_URL; '
+                                 'without either the document has no host, so clients use the one serving it.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        started = time.perf_counter()
+        body = encode_schema(generate_schema(options['url'] or settings.OPENAPI_URL or None), path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Replaced atomically so nginx never serves a half-written file.
+        with open(path + '.tmp', 'wb') as fh:
+            fh.write(body)
+        os.replace(path + '.tmp', path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path} ({len(body) / 1024:.0f} KiB) in {time.perf_counter() - started:.2f}s'
+        ))
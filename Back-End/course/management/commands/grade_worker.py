@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from course.evaluation import evaluate_runs
+from course.grading import build_jobs, claim_runs, finish_run, requeue_stale_runs, run_job, worker_name
+from course.sandbox import protect_directory
+
+
+class Command(BaseCommand):
+    help = 'Claims queued grading runs from the database and grades them on a local process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Grading processes (default: number of CPUs).')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait for new jobs when the queue is empty.')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds after which a RUNNING job is considered abandoned.')
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained.')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll = options['poll_interval']
+        stale_after = timedelta(seconds=options['stale_after'])
+        name = worker_name()
+        # Keep each process busy while its previous result is being written.
+        capacity = workers * 2
+        graded = 0
+
+        if settings.GRADING_SANDBOX_USER:
+            # Graded programs must not read other students' files.
+            for path in {settings.MEDIA_ROOT, settings.CHUNKED_UPLOAD_DIR}:
+                protect_directory(path, settings.MEDIA_GROUP)
+
+        # Children never touch the database; don't let them inherit sockets.
+        connections.close_all()
+        self.stdout.write(f'{name}: grading with {workers} process(es)')
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = {}
+            last_sweep = 0
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_sweep > stale_after.total_seconds() / 2:
+                    requeue_stale_runs(stale_after, options['max_attempts'])
+                    last_sweep = time.monotonic()
+
+                if len(in_flight) < capacity:
+                    runs = claim_runs(capacity - len(in_flight), worker=name)
+                    files = [run for run in runs if run.submission.file]
+                    for run, job in zip(files, build_jobs(files)):
+                        in_flight[pool.submit(run_job, job)] = run.pk
+                    graded += self.evaluate_prompts([run for run in runs if not run.submission.file])
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(poll)
+                    continue
+
+                done, _ = wait(in_flight, timeout=poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    run_id = in_flight.pop(future)
+                    try:
+                        score, report = future.result()
+                    except Exception as exc:
+                        finish_run(run_id, error=repr(exc))
+                    else:
+                        finish_run(run_id, score, report)
+                    graded += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{name}: graded {graded} submission(s)'))
+
+    def evaluate_prompts(self, runs):
+        """Prompt runs only wait on model calls, so they are evaluated here rather than in the pool."""
+        if not runs:
+            return 0
+        try:
+            evaluate_runs(runs)
+        except Exception as exc:
+            for run in runs:
+                finish_run(run.pk, error=repr(exc))
+        return len(runs)
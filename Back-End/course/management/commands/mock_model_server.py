@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from course.mock_model_server import MockModelServer
+
+
+class Command(BaseCommand):
+    help = 'Runs the bundled OpenAI-compatible mock model server for offline evaluation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to sleep per completion.')
+
+    def handle(self, *args, **options):
+        server = MockModelServer(options['host'], options['port'], options['latency'])
+        self.stdout.write(f'Mock model server listening on {server.base_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,211 @@
+import hashlib
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from account.models import User
+from course.cache import bump_generation
+from course.models import Blob, Submission, Task, Topic, Video
+from course.storage import BLOB_PREFIX
+
+EMAIL_DOMAIN = 'scale.seed.invalid'
+# Fixed, so the same seed gives the same rows on any day.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def placeholder(seed, index, size):
+    header = f'# seed_scale placeholder {seed}/{index}\n'.encode()
+    return header + b'#' * max(0, size - len(header) - 1) + b'\n'
+
+
+def blob_name(digest):
+    # Same layout as ContentAddressedStorage, so the files behave like uploads.
+    return '/'.join([BLOB_PREFIX, digest[:2], digest[2:4], digest + '.py'])
+
+
+def write_placeholders(root, seed, size, start, stop):
+    """Runs in a pool worker; touches the filesystem only, never the database."""
+    for index in range(start, stop):
+        content = placeholder(seed, index, size)
+        path = os.path.join(root, blob_name(hashlib.sha256(content).hexdigest()))
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.{os.getpid()}.tmp', 'wb') as fh:
+            fh.write(content)
+        os.replace(f'{path}.{os.getpid()}.tmp', path)
+    return stop - start
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Lets bulk_create keep the generated created_at/updated_at/submitted_at values."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Fills an empty database with deterministic synthetic users, topics, videos, tasks and '
+            'submissions (with small placeholder files) for load and scale testing.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--topics', type=int, default=50)
+        parser.add_argument('--tasks', type=int, default=500)
+        parser.add_argument('--videos', type=int, default=2000)
+        parser.add_argument('--submissions', type=int, default=5000000)
+        parser.add_argument('--file-ratio', type=float, default=1.0,
+                            help='Share of submissions with a file; the rest get a prompt_text.')
+        parser.add_argument('--distinct-files', type=int, default=100000,
+                            help='Unique placeholder files; submissions share them like identical uploads.')
+        parser.add_argument('--file-size', type=int, default=256, help='Placeholder size in bytes.')
+        parser.add_argument('--ungraded', type=float, default=0.05, help='Share of submissions without a grade.')
+        parser.add_argument('--days', type=int, default=365, help='Period the submissions are spread over.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes writing placeholder files; 0 writes them inline.')
+        parser.add_argument('--password', default='seed-password', help='Password of every seeded user.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__endswith='@' + EMAIL_DOMAIN).exists():
+            raise CommandError('Seed data is already present; run on an empty database (manage.py flush).')
+        if options['submissions'] and (options['users'] < 1 or options['tasks'] < 1):
+            raise CommandError('Submissions need at least one user and one task.')
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        names = self.placeholder_names()
+        pool, writes = self.start_file_writes(len(names))
+        try:
+            with explicit_timestamps(User, Topic, Video, Task, Submission, Blob):
+                user_ids = self.seed_users()
+                task_ids = self.seed_catalog()
+                references = self.seed_submissions(user_ids, task_ids, names)
+                self.timed('blobs', len(references), lambda: self.bulk(Blob, (
+                    Blob(name=names[index], sha256=names[index].rsplit('/', 1)[1][:64],
+                         size=options['file_size'], refcount=count, created_at=EPOCH)
+                    for index, count in sorted(references.items()))))
+            self.timed('files', len(names), lambda: sum(future.result() for future in writes))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'Seeded in {time.perf_counter() - started:.1f}s'))
+
+    def timed(self, label, count, fn):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<12} {count:>10}  {elapsed:7.1f}s  {count / max(elapsed, 1e-9):>10.0f}/s')
+
+    def bulk(self, model, objects):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+
+    def placeholder_names(self):
+        if not self.options['submissions'] or self.options['file_ratio'] <= 0:
+            return []
+        seed, size = self.options['seed'], self.options['file_size']
+        return [blob_name(hashlib.sha256(placeholder(seed, index, size)).hexdigest())
+                for index in range(self.options['distinct_files'])]
+
+    def start_file_writes(self, count):
+        """Starts writing the placeholders in the background while the rows are inserted."""
+        root = Submission._meta.get_field('file').storage.location
+        seed, size, workers = self.options['seed'], self.options['file_size'], self.options['workers']
+        if workers <= 0 or not count:
+            return None, [_Done(write_placeholders(root, seed, size, 0, count))]
+        # Forked, so workers need no Django setup. They never use the inherited
+        # database connection and exit without running its finalizers.
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        chunk = max(1, -(-count // (workers * 8)))
+        writes = [pool.submit(write_placeholders, root, seed, size, start, min(start + chunk, count))
+                  for start in range(0, count, chunk)]
+        return pool, writes
+
+    def seed_users(self):
+        count = self.options['users']
+        # One hash for everybody: hashing per user would take hours at this volume.
+        password = make_password(self.options['password'])
+        self.timed('users', count, lambda: self.bulk(User, (
+            User(email=f'user{i}@{EMAIL_DOMAIN}', name=f'Seed User {i}', password=password,
+                 created_at=EPOCH + timedelta(minutes=i), updated_at=EPOCH + timedelta(minutes=i))
+            for i in range(count))))
+        return list(User.objects.filter(email__endswith='@' + EMAIL_DOMAIN).order_by('pk').values_list('pk', flat=True))
+
+    def seed_catalog(self):
+        options = self.options
+        self.timed('topics', options['topics'], lambda: self.bulk(Topic, (
+            Topic(title=f'Seed topic {i}', description=f'Synthetic topic {i}.', updated_at=EPOCH)
+            for i in range(options['topics']))))
+        topic_ids = list(Topic.objects.filter(title__startswith='Seed topic ').order_by('pk').values_list('pk', flat=True))
+        if not topic_ids:
+            return []
+        self.timed('videos', options['videos'], lambda: self.bulk(Video, (
+            Video(topic_id=topic_ids[i % len(topic_ids)], title=f'Seed video {i}',
+                  video_url=f'https://videos.example.invalid/{i}',
+                  created_at=EPOCH + timedelta(hours=i), updated_at=EPOCH + timedelta(hours=i))
+            for i in range(options['videos']))))
+        self.timed('tasks', options['tasks'], lambda: self.bulk(Task, (
+            Task(topic_id=topic_ids[i % len(topic_ids)], title=f'Seed task {i}', description=f'Synthetic task {i}.',
+                 created_at=EPOCH + timedelta(hours=i), updated_at=EPOCH + timedelta(hours=i))
+            for i in range(options['tasks']))))
+        return list(Task.objects.filter(topic_id__in=topic_ids).order_by('pk').values_list('pk', flat=True))
+
+    def seed_submissions(self, user_ids, task_ids, names):
+        options, rng = self.options, self.rng
+        count = options['submissions']
+        references = Counter()
+        step = options['days'] * 86400 / max(count, 1)
+
+        def submissions():
+            for i in range(count):
+                # Squaring skews activity towards the first users, like real cohorts.
+                user_id = user_ids[int(len(user_ids) * rng.random() ** 2)]
+                task_id = task_ids[rng.randrange(len(task_ids))]
+                file, prompt_text = '', ''
+                if names and rng.random() < options['file_ratio']:
+                    index = rng.randrange(len(names))
+                    references[index] += 1
+                    file = names[index]
+                else:
+                    prompt_text = f'Seed prompt {i}'
+                grade = None if rng.random() < options['ungraded'] else rng.randrange(101)
+                yield Submission(task_id=task_id, user_id=user_id, file=file, prompt_text=prompt_text,
+                                 submitted_at=EPOCH + timedelta(seconds=int(i * step)), grade=grade)
+
+        self.timed('submissions', count, lambda: self.bulk(Submission, submissions()))
+        return references
+
+
+class _Done:
+    """A finished write, for the inline path."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
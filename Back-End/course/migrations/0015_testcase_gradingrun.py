@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0014_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestCase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input_text', models.TextField(blank=True)),
+                ('expected_output', models.TextField()),
+                ('index', models.PositiveIntegerField(default=0)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='testcases', to='course.task')),
+            ],
+            options={
+                'ordering': ['index', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GradingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('report', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('claim_token', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grading_runs', to='course.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='gradingrun_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexOnline(migrations.AddIndex):
+    """
+    CREATE INDEX CONCURRENTLY on Postgres, so building indexes over millions
+    of submissions does not block writes; a plain CREATE INDEX elsewhere.
+    Written against the schema editor rather than contrib.postgres, whose
+    import needs a Postgres driver even on SQLite checkouts.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(self.index.create_sql(model, schema_editor, concurrently=True), params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(self.index.remove_sql(model, schema_editor, concurrently=True))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('course', '0016_submission_prompt_text_modelresponse'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Create the composite indexes before dropping the FK indexes they cover.
+        AddIndexOnline(
+            model_name='submission',
+            index=models.Index(fields=['user', 'submitted_at', 'id'], name='submission_user_time_idx'),
+        ),
+        AddIndexOnline(
+            model_name='submission',
+            index=models.Index(fields=['task', 'submitted_at', 'id'], name='submission_task_time_idx'),
+        ),
+        AddIndexOnline(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['submitted_at', 'id'], name='submission_ungraded_idx'),
+        ),
+        AddIndexOnline(
+            model_name='task',
+            index=models.Index(fields=['topic', 'created_at'], name='task_topic_created_idx'),
+        ),
+        AddIndexOnline(
+            model_name='video',
+            index=models.Index(fields=['topic', 'created_at'], name='video_topic_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='task',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='course.task'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='topic',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='course.topic'),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='topic',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='videos', to='course.topic'),
+        ),
+    ]
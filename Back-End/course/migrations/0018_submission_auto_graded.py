@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:11
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Round
+
+
+def flag_auto_grades(apps, schema_editor):
+    # Grades that still equal the score of a finished grading run came from the grade worker.
+    Submission = apps.get_model('course', 'Submission')
+    GradingRun = apps.get_model('course', 'GradingRun')
+    runs = GradingRun.objects.filter(submission=OuterRef('pk'), status='DONE', score__isnull=False)
+    Submission.objects.filter(
+        Exists(runs.annotate(rounded=Round('score')).filter(rounded=OuterRef('grade'))),
+        grade__isnull=False,
+    ).update(auto_graded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0017_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='auto_graded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_auto_grades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:39
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0018_submission_auto_graded'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='pass_threshold',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,84 @@
+"""
+A tiny OpenAI-compatible ``/v1/chat/completions`` server for offline tests
+and local development of the evaluation harness.
+
+Replies are deterministic: the last line of the user message is the test
+input, and the rest of the prompt selects the transformation (``uppercase``,
+``lowercase``, ``reverse``, ``count words``), falling back to echoing the
+input. ``latency`` simulates a slow remote model.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def mock_completion(prompt):
+    instructions, _, text = prompt.rpartition('\n')
+    instructions = instructions.lower()
+    if 'uppercase' in instructions:
+        return text.upper()
+    if 'lowercase' in instructions:
+        return text.lower()
+    if 'reverse' in instructions:
+        return text[::-1]
+    if 'count words' in instructions:
+        return str(len(text.split()))
+    return text
+
+
+class MockModelHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            return self.reply(404, {'error': {'message': 'Not found'}})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            prompt = body['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            return self.reply(400, {'error': {'message': 'Invalid request'}})
+
+        self.server.calls += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.reply(200, {
+            'object': 'chat.completion',
+            'model': body.get('model', 'mock'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': mock_completion(prompt)},
+                         'finish_reason': 'stop'}],
+        })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), MockModelHandler)
+        self.latency = latency
+        self.calls = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serves from a daemon thread; returns ``self`` for chaining."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
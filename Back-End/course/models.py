@@ -1,11 +1,15 @@
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from account.models import User
 import os
 import uuid
+from .storage import get_content_storage
 
 class Topic(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -17,33 +21,187 @@ class Topic(models.Model):
 #     return os.path.join('videos', filename)
 
 class Video(models.Model):
-    topic = models.ForeignKey(Topic, related_name='videos', on_delete=models.CASCADE)
+    # Indexed by video_topic_created_idx.
+    topic = models.ForeignKey(Topic, related_name='videos', on_delete=models.CASCADE, db_index=False)
     title = models.CharField(max_length=255)
     # video_file = models.FileField(upload_to=video_file_path)
     video_url= models.CharField(max_length=512,default=None,blank=True,null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at'], name='video_topic_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 class Task(models.Model):
-    topic = models.ForeignKey(Topic, related_name='tasks', on_delete=models.CASCADE)
+    # Indexed by task_topic_created_idx.
+    topic = models.ForeignKey(Topic, related_name='tasks', on_delete=models.CASCADE, db_index=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    attachment = models.FileField(upload_to='tasks/', blank=True, null=True) 
+    attachment = models.FileField(upload_to='tasks/', storage=get_content_storage, blank=True, null=True) 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     creator = models.ForeignKey(User, related_name='created_tasks', null=True, on_delete=models.CASCADE)
+    # Fraction (0-1) of the test weight needed to pass. When set, grading is
+    # pass/fail and stops as soon as a failure decides it; when null the
+    # grade is the passed share of the weight.
+    pass_threshold = models.FloatField(null=True, blank=True,
+                                       validators=[MinValueValidator(0), MaxValueValidator(1)])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at'], name='task_topic_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
 class Submission(models.Model):
-    task = models.ForeignKey(Task, related_name='submissions', on_delete=models.CASCADE)
-    user = models.ForeignKey(User, related_name='submissions', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='submissions/')
+    # Indexed by submission_task_time_idx / submission_user_time_idx.
+    task = models.ForeignKey(Task, related_name='submissions', on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(User, related_name='submissions', on_delete=models.CASCADE, db_index=False)
+    file = models.FileField(upload_to='submissions/', storage=get_content_storage, blank=True)
+    prompt_text = models.TextField(blank=True, default='')
     submitted_at = models.DateTimeField(auto_now_add=True)
     grade = models.IntegerField(blank=True, null=True)  
+    # Set when the grade came from the grade worker; staff grades are never overwritten by it.
+    auto_graded = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see SubmissionCursorPagination.
+            models.Index(fields=['submitted_at', 'id'], name='submission_keyset_idx'),
+            # The same order within one student's or one task's submissions
+            # (SubmissionFilter ?user= / ?task=, students' own list).
+            models.Index(fields=['user', 'submitted_at', 'id'], name='submission_user_time_idx'),
+            models.Index(fields=['task', 'submitted_at', 'id'], name='submission_task_time_idx'),
+            # The grading queue (?graded=false) is a small slice of the table.
+            models.Index(fields=['submitted_at', 'id'], condition=models.Q(grade__isnull=True),
+                         name='submission_ungraded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.name} - {self.task.title}"
+
+class TestCase(models.Model):
+    task = models.ForeignKey(Task, related_name='testcases', on_delete=models.CASCADE)
+    input_text = models.TextField(blank=True)
+    expected_output = models.TextField()
+    index = models.PositiveIntegerField(default=0)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        ordering = ['index', 'id']
+
+    def __str__(self):
+        return f"{self.task.title} #{self.index}"
+
+
+class GradingRun(models.Model):
+    """
+    One automatic grading attempt for a submission. Pending rows double as the
+    job queue consumed by ``manage.py grade_worker``.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    submission = models.ForeignKey(Submission, related_name='grading_runs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    score = models.FloatField(blank=True, null=True)
+    report = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    claim_token = models.UUIDField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='gradingrun_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.submission} - {self.status}"
+
+
+class ModelResponse(models.Model):
+    """
+    Cached model completion keyed on ``sha256(model, prompt, input)``, so an
+    unchanged prompt is never sent to the model twice.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=100)
+    response = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} - {self.key[:12]}"
+
+
+class Blob(models.Model):
+    """Reference count for a file in ``ContentAddressedStorage``."""
+    name = models.CharField(max_length=255, primary_key=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload in progress. Chunks are appended to ``partial_path``;
+    the on-disk size is the authoritative offset, so an upload survives a
+    worker dying mid-chunk and simply resumes from what reached the disk.
+    """
+    SUBMISSION = 'submission'
+    TASK_ATTACHMENT = 'task_attachment'
+    TARGET_CHOICES = [
+        (SUBMISSION, 'Submission file'),
+        (TASK_ATTACHMENT, 'Task attachment'),
+    ]
+
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name='chunked_uploads', on_delete=models.CASCADE)
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    task = models.ForeignKey(Task, related_name='chunked_uploads', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    submission = models.ForeignKey(Submission, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def partial_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
 
     def __str__(self):
-        return f"{self.user.name} - {self.task.title}"
\ No newline at end of file
+        return f"{self.user} - {self.filename} ({self.offset}/{self.size})"
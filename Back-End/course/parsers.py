@@ -0,0 +1,22 @@
+import csv
+import io
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def read_csv_rows(text):
+    return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+
+class CSVParser(BaseParser):
+    """Parses a ``text/csv`` body with a header row into a list of dicts."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return read_csv_rows(stream.read().decode(encoding))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError('CSV parse error - %s' % exc)
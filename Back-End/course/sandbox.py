@@ -0,0 +1,294 @@
+"""
+Runs untrusted programs against test cases in parallel, resource-limited
+subprocesses.
+
+Each test case gets its own process with rlimits for CPU time, address space,
+written file size and process count. stdout/stderr go to temporary files, so
+``RLIMIT_FSIZE`` doubles as the output cap and output is never buffered in
+memory. A timer enforces the wall-clock limit, and ``os.wait4`` supplies
+per-test CPU time and peak memory.
+
+Children get a minimal environment (never the worker's secrets) and, with
+``user``, run as that unprivileged account. ``RLIMIT_NPROC`` counts every
+process of the account and does not bind root, so the process cap only
+holds with a dedicated user.
+"""
+import grp
+import os
+import pwd
+import resource
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+PASSED = 'passed'
+FAILED = 'failed'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+CPU_LIMIT = 'cpu_limit'
+MEMORY_LIMIT = 'memory_limit'
+OUTPUT_LIMIT = 'output_limit'
+SKIPPED = 'skipped'
+
+STDERR_EXCERPT = 1024
+SANDBOX_PATH = '/usr/local/bin:/usr/bin:/bin'
+
+# Sets the rlimits, then execs the program. Runs as the child's first
+# program: the Runner forks from pool threads, where preexec_fn is unsafe.
+LAUNCHER = """
+import os, resource, sys
+end = sys.argv.index('--')
+for spec in sys.argv[1:end]:
+    name, soft, hard = spec.split(':')
+    resource.setrlimit(getattr(resource, name), (int(soft), int(hard)))
+os.execvp(sys.argv[end + 1], sys.argv[end + 1:])
+"""
+
+
+@dataclass(frozen=True)
+class Limits:
+    cpu_seconds: int = 2
+    wall_seconds: float = 5.0
+    memory_bytes: int = 256 * 1024 * 1024
+    output_bytes: int = 64 * 1024
+    processes: int = 64
+
+    def wrap(self, command):
+        """``command`` prefixed with the launcher that applies these limits."""
+        limits = [
+            ('RLIMIT_CPU', self.cpu_seconds, self.cpu_seconds + 1),
+            ('RLIMIT_AS', self.memory_bytes, self.memory_bytes),
+            ('RLIMIT_FSIZE', self.output_bytes, self.output_bytes),
+            ('RLIMIT_NPROC', self.processes, self.processes),
+            ('RLIMIT_CORE', 0, 0),
+        ]
+        return [sys.executable, '-I', '-S', '-c', LAUNCHER,
+                *(f'{name}:{soft}:{hard}' for name, soft, hard in limits), '--', *command]
+
+
+def sandbox_env(home):
+    return {
+        'PATH': SANDBOX_PATH,
+        'HOME': home,
+        'LANG': 'C.UTF-8',
+        'PYTHONIOENCODING': 'utf-8',
+        'PYTHONDONTWRITEBYTECODE': '1',
+    }
+
+
+def resolve_user(user):
+    """``(uid, gid)`` of an account name or uid; ``None`` keeps the worker's own."""
+    if user in (None, ''):
+        return None
+    entry = pwd.getpwuid(user) if isinstance(user, int) else pwd.getpwnam(user)
+    return entry.pw_uid, entry.pw_gid
+
+
+def protect_directory(path, group=None):
+    """
+    Creates ``path`` if needed and strips every permission for "other" from
+    it, so sandboxed programs cannot reach anything below whatever the modes
+    of the files there. ``group`` (a name or gid) is given read access, for
+    readers such as nginx that serve the same files from another container.
+    """
+    os.makedirs(path, exist_ok=True)
+    mode = stat.S_IMODE(os.stat(path).st_mode) & ~stat.S_IRWXO
+    if group not in (None, ''):
+        gid = int(group) if str(group).isdigit() else grp.getgrnam(group).gr_gid
+        os.chown(path, -1, gid)
+        mode |= stat.S_IRGRP | stat.S_IXGRP
+    os.chmod(path, mode)
+
+
+@contextmanager
+def private_copy(path, user=None):
+    """
+    Yields a copy of ``path`` in a fresh directory, used as the child's cwd
+    and HOME, so it never sees other files next to the original. Owned by
+    ``user`` when given, and removed afterwards.
+    """
+    ids = resolve_user(user)
+    with tempfile.TemporaryDirectory(prefix='sandbox-') as workdir:
+        copy = os.path.join(workdir, 'solution' + os.path.splitext(path)[1])
+        shutil.copyfile(path, copy)
+        if ids:
+            os.chown(workdir, *ids)
+            os.chown(copy, *ids)
+        yield copy
+
+
+@dataclass
+class TestResult:
+    index: int
+    status: str
+    weight: int = 1
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    max_rss_kb: int = 0
+    returncode: int = None
+    stderr: str = ''
+
+
+@dataclass
+class Report:
+    score: float = None
+    passed_weight: int = 0
+    total_weight: int = 0
+    stopped_early: bool = False
+    wall_time: float = 0.0
+    tests: list = field(default_factory=list)
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def compare_output(actual, expected):
+    return actual.strip() == expected.strip()
+
+
+class Runner:
+    """
+    ``Runner(command, limits).run(testcases)`` where each test case is a dict
+    with ``input``, ``expected`` and optional ``weight``.
+
+    With ``pass_threshold`` (a 0-1 fraction of the total weight) the score is
+    pass/fail, and the run stops as soon as the failed weight makes the
+    threshold unreachable: running processes are killed and queued ones are
+    reported as skipped.
+    """
+
+    def __init__(self, command, limits=None, max_workers=None, pass_threshold=None, cwd=None, env=None, user=None):
+        self.command = list(command)
+        self.limits = limits or Limits()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pass_threshold = pass_threshold
+        self.cwd = cwd
+        self.env = env if env is not None else sandbox_env(cwd or tempfile.gettempdir())
+        self.ids = resolve_user(user)
+
+    def run(self, testcases):
+        started = time.perf_counter()
+        self.decided = threading.Event()
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.total_weight = sum(testcase.get('weight', 1) for testcase in testcases)
+        self.failed_weight = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.run_one, index, testcase) for index, testcase in enumerate(testcases)]
+            tests = [future.result() for future in futures]
+
+        passed = sum(test.weight for test in tests if test.status == PASSED)
+        if not self.total_weight:
+            score = None
+        elif self.pass_threshold is None:
+            score = 100.0 * passed / self.total_weight
+        else:
+            score = 100.0 if passed >= self.pass_threshold * self.total_weight else 0.0
+        return Report(score=score, passed_weight=passed, total_weight=self.total_weight,
+                      stopped_early=self.decided.is_set(), wall_time=time.perf_counter() - started, tests=tests)
+
+    def run_one(self, index, testcase):
+        weight = testcase.get('weight', 1)
+        if self.decided.is_set():
+            return TestResult(index=index, status=SKIPPED, weight=weight)
+
+        result = self.execute(index, testcase, weight)
+        if result.status not in (PASSED, SKIPPED):
+            self.record_failure(weight)
+        return result
+
+    def record_failure(self, weight):
+        if self.pass_threshold is None:
+            return
+        with self.lock:
+            self.failed_weight += weight
+            if self.total_weight - self.failed_weight < self.pass_threshold * self.total_weight:
+                self.decided.set()
+                for process in list(self.processes):
+                    self.kill(process)
+
+    def kill(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def execute(self, index, testcase, weight):
+        with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, \
+                tempfile.TemporaryFile() as stderr:
+            stdin.write(testcase.get('input', '').encode())
+            stdin.seek(0)
+            started = time.perf_counter()
+            try:
+                process = subprocess.Popen(
+                    self.limits.wrap(self.command), stdin=stdin, stdout=stdout, stderr=stderr,
+                    cwd=self.cwd, env=self.env, start_new_session=True, close_fds=True,
+                    user=self.ids and self.ids[0], group=self.ids and self.ids[1],
+                    extra_groups=[] if self.ids else None,
+                )
+            except OSError as exc:
+                return TestResult(index=index, status=ERROR, weight=weight, stderr=str(exc))
+
+            with self.lock:
+                self.processes.add(process)
+            timed_out = threading.Event()
+
+            def on_timeout():
+                timed_out.set()
+                self.kill(process)
+
+            timer = threading.Timer(self.limits.wall_seconds, on_timeout)
+            timer.start()
+            try:
+                _, wait_status, usage = os.wait4(process.pid, 0)
+            finally:
+                timer.cancel()
+                with self.lock:
+                    self.processes.discard(process)
+            # Reaped by wait4; tell Popen so it does not try again.
+            process.returncode = os.waitstatus_to_exitcode(wait_status)
+            wall_time = time.perf_counter() - started
+
+            stdout.seek(0)
+            stderr.seek(0)
+            output = stdout.read()
+            errors = stderr.read(STDERR_EXCERPT).decode(errors='replace')
+
+        status = self.classify(process.returncode, timed_out.is_set(), errors)
+        if status in (PASSED, ERROR) and len(output) >= self.limits.output_bytes:
+            # Python children ignore SIGXFSZ and die on EFBIG instead.
+            status = OUTPUT_LIMIT
+        result = TestResult(
+            index=index, status=status,
+            weight=weight, wall_time=wall_time, cpu_time=usage.ru_utime + usage.ru_stime,
+            max_rss_kb=usage.ru_maxrss, returncode=process.returncode, stderr=errors,
+        )
+        if status == PASSED and not compare_output(output.decode(errors='replace'), testcase.get('expected', '')):
+            result.status = FAILED
+        return result
+
+    def classify(self, returncode, timed_out, errors):
+        if timed_out:
+            return TIMEOUT
+        if returncode == -signal.SIGKILL and self.decided.is_set():
+            return SKIPPED
+        if returncode == -signal.SIGXCPU or returncode == -signal.SIGKILL:
+            return CPU_LIMIT
+        if returncode == -signal.SIGXFSZ:
+            return OUTPUT_LIMIT
+        if returncode != 0:
+            return MEMORY_LIMIT if 'MemoryError' in errors else ERROR
+        return PASSED
+
+
+def run_testcases(command, testcases, **kwargs):
+    return Runner(command, **kwargs).run(testcases)
@@ -1,16 +1,52 @@
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
 from rest_framework import serializers
-from .models import Submission, Topic, Video, Task
+from rest_framework.reverse import reverse
+from django.conf import settings
+from .models import ChunkedUpload, Submission, Topic, Video, Task
+
+class DownloadFileField(serializers.FileField):
+    """
+    Writes like a FileField but reads as the row's authorized download URL,
+    since media is no longer served publicly.
+    """
+
+    def __init__(self, view_name, **kwargs):
+        self.view_name = view_name
+        super().__init__(**kwargs)
+
+    def download_url(self, pk, request=None):
+        return reverse(self.view_name, kwargs={'pk': pk}, request=request)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return self.download_url(value.instance.pk, self.context.get('request'))
+
+
+class DownloadURLMixin:
+    """Builds the file fields named in ``Meta.download_views`` as ``DownloadFileField``."""
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        view_name = getattr(self.Meta, 'download_views', {}).get(field_name)
+        if view_name is not None:
+            field_class = DownloadFileField
+            field_kwargs['view_name'] = view_name
+        return field_class, field_kwargs
+
 
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
         fields = '__all__'
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(DownloadURLMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = '__all__'
         read_only_fields = ['creator', 'created_at']
+        download_views = {'attachment': 'task-attachment'}
 
 class TopicSerializer(serializers.ModelSerializer):
     videos = VideoSerializer(many=True, read_only=True)
@@ -35,11 +71,17 @@ class TopicWithTasksSerializer(serializers.ModelSerializer):
         model = Topic
         fields = ['id', 'title', 'description', 'tasks']
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(DownloadURLMixin, serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = '__all__'
-        read_only_fields = ['user', 'submitted_at']
+        read_only_fields = ['user', 'submitted_at', 'auto_graded']
+        download_views = {'file': 'submission-download'}
+
+    def validate(self, attrs):
+        if self.instance is None and not attrs.get('file') and not attrs.get('prompt_text'):
+            raise serializers.ValidationError('Submit a file or a prompt_text.')
+        return attrs
 
     def get_extra_kwargs(self):
         extra_kwargs = super().get_extra_kwargs()
@@ -52,4 +94,124 @@ class SubmissionSerializer(serializers.ModelSerializer):
                 if not request.user.is_staff:
                     extra_kwargs['grade'] = {'read_only': True}
 
-        return extra_kwargs
\ No newline at end of file
+        return extra_kwargs
+
+    def update(self, instance, validated_data):
+        if 'grade' in validated_data:
+            validated_data['auto_graded'] = False
+        return super().update(instance, validated_data)
+
+
+class BulkGradeSerializer(serializers.Serializer):
+    """
+    Validates ``[{"id": ..., "grade": ...}, ...]`` in a single pass with one
+    ``pk__in`` lookup, and applies the whole batch in one transaction. Rows
+    are checked with plain Python rather than a nested serializer per row,
+    which keeps thousands of rows well under a second. The batch is
+    all-or-nothing: any invalid row rejects every change.
+    """
+    max_rows = 10000
+    update_batch_size = 5000
+    min_int, max_int = -2 ** 31, 2 ** 31 - 1
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of {"id", "grade"} rows.']})
+        if len(data) > self.max_rows:
+            raise serializers.ValidationError({'non_field_errors': [f'At most {self.max_rows} rows per request.']})
+
+        grades, rows, errors = {}, {}, []
+        for index, row in enumerate(data):
+            if not isinstance(row, dict):
+                errors.append({'row': index, 'errors': {'non_field_errors': ['Expected an object.']}})
+                continue
+            row_errors = {}
+            pk = self.parse_int(row.get('id'), 'id', row_errors)
+            grade = self.parse_int(row.get('grade'), 'grade', row_errors, allow_null=True)
+            if pk in grades:
+                row_errors['id'] = ['Duplicate submission id.']
+            if row_errors:
+                errors.append({'row': index, 'id': row.get('id'), 'errors': row_errors})
+            else:
+                grades[pk], rows[pk] = grade, index
+
+        existing = set(Submission.objects.filter(pk__in=grades).values_list('pk', flat=True))
+        errors += [
+            {'row': rows[pk], 'id': pk, 'errors': {'id': ['Submission does not exist.']}}
+            for pk in grades if pk not in existing
+        ]
+        if errors:
+            errors.sort(key=lambda error: error['row'])
+            raise serializers.ValidationError({'rows': errors})
+        return grades
+
+    def parse_int(self, value, field, errors, allow_null=False):
+        if value is None or value == '':
+            if not allow_null:
+                errors[field] = ['This field is required.']
+            return None
+        if isinstance(value, str):
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+        if not isinstance(value, int) or isinstance(value, bool):
+            errors[field] = ['A valid integer is required.']
+            return None
+        if not self.min_int <= value <= self.max_int:
+            # Would overflow the integer column instead of failing validation.
+            errors[field] = ['Integer out of range.']
+            return None
+        return value
+
+    def save(self):
+        grades = self.validated_data
+        results, changed = [], []
+        with transaction.atomic():
+            current = {pk: (grade, auto) for pk, grade, auto in Submission.objects.select_for_update()
+                       .filter(pk__in=grades).values_list('id', 'grade', 'auto_graded')}
+            for pk, grade in grades.items():
+                status = 'unchanged' if current[pk][0] == grade else 'updated'
+                # Also confirms automatic grades, so the grade worker keeps them.
+                if status == 'updated' or current[pk][1]:
+                    changed.append(pk)
+                results.append({'id': pk, 'grade': grade, 'status': status})
+            for start in range(0, len(changed), self.update_batch_size):
+                self.bulk_update(changed[start:start + self.update_batch_size], grades)
+        return results
+
+    def bulk_update(self, pks, grades):
+        # Like QuerySet.bulk_update(), but with one WHEN per distinct grade
+        # instead of one per row: grades repeat a lot and Django's per-row
+        # CASE expressions dominate the cost of large batches.
+        by_grade = {}
+        for pk in pks:
+            by_grade.setdefault(grades[pk], []).append(pk)
+        Submission.objects.filter(pk__in=pks).update(grade=Case(
+            *[When(pk__in=ids, then=Value(grade)) for grade, ids in by_grade.items()],
+            output_field=IntegerField(),
+        ), auto_graded=False)
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'target', 'task', 'filename', 'size', 'sha256', 'offset', 'status', 'submission', 'created_at']
+        read_only_fields = ['offset', 'status', 'submission', 'created_at']
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError('Expected a hex-encoded SHA-256 digest.')
+        return value
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        if attrs['target'] == ChunkedUpload.TASK_ATTACHMENT and not (request and request.user.is_staff):
+            raise serializers.ValidationError('Only staff can upload task attachments.')
+        return attrs
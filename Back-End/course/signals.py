@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from .cache import bump_generation
+from .models import Submission, Task, Topic, Video
+
+CATALOG_MODELS = (Topic, Video, Task)
+# Models whose file field lives in ContentAddressedStorage.
+FILE_FIELDS = {Submission: 'file', Task: 'attachment'}
+
+
+def bump_generation_on_commit(sender, using, **kwargs):
+    # Bumping before the write commits would let a concurrent read cache the
+    # old rows under the new generation.
+    transaction.on_commit(bump_generation, using=using)
+
+
+def connect_catalog_signals():
+    for model in CATALOG_MODELS:
+        post_save.connect(bump_generation_on_commit, sender=model, dispatch_uid=f'catalog-save-{model.__name__}')
+        post_delete.connect(bump_generation_on_commit, sender=model, dispatch_uid=f'catalog-delete-{model.__name__}')
+
+
+def remember_file(sender, instance, **kwargs):
+    field = FILE_FIELDS[sender]
+    # Skip deferred fields: reading them here would cost a query per row.
+    if field in instance.__dict__:
+        instance._original_file = instance.__dict__[field] and str(instance.__dict__[field])
+
+
+def release_replaced_file(sender, instance, **kwargs):
+    field = FILE_FIELDS[sender]
+    if field not in instance.__dict__:
+        return
+    current = getattr(instance, field)
+    original = getattr(instance, '_original_file', None)
+    if original and original != current.name:
+        current.storage.delete(original)
+    instance._original_file = current.name
+
+
+def release_deleted_file(sender, instance, **kwargs):
+    field = FILE_FIELDS[sender]
+    if field not in instance.__dict__:
+        return
+    file = getattr(instance, field)
+    if file:
+        file.storage.delete(file.name)
+
+
+def connect_storage_signals():
+    for model in FILE_FIELDS:
+        post_init.connect(remember_file, sender=model, dispatch_uid=f'storage-init-{model.__name__}')
+        post_save.connect(release_replaced_file, sender=model, dispatch_uid=f'storage-save-{model.__name__}')
+        post_delete.connect(release_deleted_file, sender=model, dispatch_uid=f'storage-delete-{model.__name__}')
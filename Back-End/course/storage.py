@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs'
+BLOCK_SIZE = 1024 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every unique file once under ``blobs/<aa>/<bb>/<sha256><ext>``.
+
+    ``save()`` hashes the content while streaming it to a temporary file, then
+    either moves it into place or drops it if that blob already exists.
+    ``course.models.Blob`` counts how many rows point at each blob;
+    ``delete()`` releases one reference and only removes the file once the
+    count reaches zero.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(); colliding
+        # names are the whole point, so never add Django's random suffix.
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        tmp_dir = self.path(os.path.join(BLOB_PREFIX, '.tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest, size, tmp_path = self._hash_to_temp(content, tmp_dir)
+        ext = os.path.splitext(name)[1].lower()
+        blob_name = '/'.join([BLOB_PREFIX, digest[:2], digest[2:4], digest + ext])
+
+        try:
+            with transaction.atomic():
+                Blob.objects.get_or_create(name=blob_name, defaults={'sha256': digest, 'size': size})
+                # The UPDATE's row lock serializes against delete() of the same blob.
+                Blob.objects.filter(name=blob_name).update(refcount=F('refcount') + 1)
+                full_path = self.path(blob_name)
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(tmp_path, self.file_permissions_mode)
+                    os.replace(tmp_path, full_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return blob_name
+
+    def _hash_to_temp(self, content, tmp_dir):
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk: hash it in place and move it instead of copying.
+            os.close(fd)
+            source = content.temporary_file_path()
+            with open(source, 'rb') as fh:
+                for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+                    digest.update(block)
+                    size += len(block)
+            file_move_safe(source, tmp_path, allow_overwrite=True)
+            return digest.hexdigest(), size, tmp_path
+
+        with os.fdopen(fd, 'wb') as fh:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for block in content.chunks(BLOCK_SIZE):
+                if isinstance(block, str):
+                    block = block.encode()
+                digest.update(block)
+                size += len(block)
+                fh.write(block)
+        return digest.hexdigest(), size, tmp_path
+
+    def delete(self, name):
+        """Releases one reference; the file goes when nothing points to it."""
+        from .models import Blob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Not managed by the store (e.g. a pre-migration path).
+                return
+            if blob.refcount > 1:
+                Blob.objects.filter(name=name).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage
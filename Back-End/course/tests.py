@@ -1,3 +1,1477 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_started
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.urls import clear_url_caches, reverse
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from AiAgentWeb import api_docs, boot, db_pool, db_router, metrics, profiling
+from AiAgentWeb.fast_json import FastJSONParser, FastJSONRenderer
+from account.models import User
+from account.renderers import UserRenderer
+from . import evaluation, grading, sandbox
+from .cache import get_generation
+from .conditional import ConditionalGetMixin
+from .evaluation import HTTPModelClient
+from .management.commands import grade_worker
+from .fast_serializers import _compiled, compile_serializer
+from .mock_model_server import MockModelServer
+from .models import Blob, ChunkedUpload, GradingRun, ModelResponse, Submission, Topic, Video, Task
+from .models import TestCase as GradingTestCase
+from .serializers import SubmissionSerializer, TaskSerializer, TopicSerializer, TopicWithTasksSerializer, TopicWithVideosSerializer, VideoSerializer
+from .views import ChunkedUploadViewSet
 
-# Create your tests here.
+
+class CatalogQueryBudgetTests(TestCase):
+    """Topic catalog endpoints must run in a fixed number of queries."""
+
+    # Budgets exclude authentication: clients are force-authenticated.
+    # Each counts one validator aggregate per model, the topic query and one
+    # values() query per nested relation on the compiled read path.
+    budgets = {
+        'topics-list': 6,
+        'topics-detail': 6,
+        'topic-videos': 4,
+        'topic-tasks': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        for i in range(5):
+            cls.make_topic(i)
+
+    @classmethod
+    def make_topic(cls, i):
+        topic = Topic.objects.create(title=f'Topic {i}', description='...')
+        for j in range(3):
+            Video.objects.create(topic=topic, title=f'Video {i}.{j}', video_url='https://example.com/v')
+            Task.objects.create(topic=topic, title=f'Task {i}.{j}', creator=cls.user)
+        return topic
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.topic = Topic.objects.first()
+
+    def url(self, name):
+        if name == 'topics-list':
+            return reverse(name)
+        return reverse(name, kwargs={'pk': self.topic.pk})
+
+    def assertWithinBudget(self, name):
+        with self.assertNumQueries(self.budgets[name]):
+            response = self.client.get(self.url(name))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_endpoints_within_budget(self):
+        for name in self.budgets:
+            with self.subTest(endpoint=name):
+                self.assertWithinBudget(name)
+
+    def test_nested_relations_are_compiled(self):
+        # No prefetch_related() fallback: the budgets rely on these compiling.
+        for serializer in (TopicSerializer, TopicWithVideosSerializer, TopicWithTasksSerializer):
+            self.assertIsNotNone(compile_serializer(serializer))
+
+    def test_budget_independent_of_catalog_size(self):
+        for i in range(5, 25):
+            self.make_topic(i)
+        response = self.assertWithinBudget('topics-list')
+        self.assertEqual(len(response.data), 25)
+        self.assertEqual(len(response.data[0]['videos']), 3)
+        self.assertEqual(len(response.data[0]['tasks']), 3)
+
+
+class CatalogResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        cls.topic = Topic.objects.create(title='Agents')
+        Video.objects.create(topic=cls.topic, title='Intro')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hit_skips_database(self):
+        url = reverse('topic-videos', kwargs={'pk': self.topic.pk})
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_writes_invalidate(self):
+        url = reverse('topics-list')
+        self.client.get(url)
+        generation = get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.create(topic=self.topic, title='Tools')
+            # Uncommitted rows must not retire the generation yet.
+            self.assertEqual(get_generation(), generation)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data[0]['videos']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(topic=self.topic, title='Build an agent').delete()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+
+
+class ConditionalRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        cls.topic = Topic.objects.create(title='Agents')
+        cls.task = Task.objects.create(topic=cls.topic, title='Planner', creator=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('topic-tasks', kwargs={'pk': self.topic.pk})
+
+    def test_if_none_match_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_etag_changes_with_rows(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(topic=self.topic, title='Critic', creator=self.admin)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(title='Critic').delete()
+        self.assertNotEqual(self.client.get(self.url)['ETag'], response['ETag'])
+
+    def test_if_match_prevents_lost_update(self):
+        url = reverse('task-detail', kwargs={'pk': self.task.pk})
+        etag = self.client.get(url)['ETag']
+        first = self.client.patch(url, {'title': 'Planner v2'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first['ETag'], etag)
+
+        stale = self.client.patch(url, {'title': 'Planner v3'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(stale.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Planner v2')
+
+    def test_if_match_check_runs_under_row_lock(self):
+        url = reverse('task-detail', kwargs={'pk': self.task.pk})
+        etag = self.client.get(url)['ETag']
+        order, depth = [], len(connection.atomic_blocks)
+        real_lock = ConditionalGetMixin.lock_object
+        real_validators = ConditionalGetMixin.compute_validators
+
+        def lock_object(view):
+            order.append(('lock', len(connection.atomic_blocks) > depth))
+            return real_lock(view)
+
+        def compute_validators(view, request):
+            order.append('check')
+            return real_validators(view, request)
+
+        with mock.patch.object(ConditionalGetMixin, 'lock_object', lock_object), \
+                mock.patch.object(ConditionalGetMixin, 'compute_validators', compute_validators), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'title': 'Planner v2'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(order[:2], [('lock', True), 'check'])
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries))
+
+    def test_default_validators_follow_lookup(self):
+        url = reverse('video-detail', kwargs={'pk': Video.objects.create(topic=self.topic, title='Intro').pk})
+        etag = self.client.get(url)['ETag']
+        Video.objects.create(topic=self.topic, title='Other')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+
+class SubmissionPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        topic = Topic.objects.create(title='Agents')
+        cls.tasks = [Task.objects.create(topic=topic, title=f'Task {i}') for i in range(2)]
+        Submission.objects.bulk_create([
+            Submission(task=cls.tasks[i % 2], user=cls.student if i % 3 else cls.admin,
+                       file=f'submissions/{i}.py', grade=i if i % 4 == 0 else None)
+            for i in range(23)
+        ])
+        # Force ties on submitted_at so the id tiebreaker is exercised.
+        Submission.objects.update(submitted_at=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('submission-list')
+
+    def collect(self, url):
+        ids, pages = [], 0
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_walks_every_row_once_in_key_order(self):
+        ids, pages = self.collect(self.url + '?page_size=5')
+        self.assertEqual(pages, 5)
+        self.assertEqual(ids, sorted(Submission.objects.values_list('id', flat=True)))
+
+    def test_previous_link(self):
+        first = self.client.get(self.url, {'page_size': 5})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_filters(self):
+        ids, _ = self.collect(f'{self.url}?task={self.tasks[0].pk}&graded=false')
+        expected = Submission.objects.filter(task=self.tasks[0], grade__isnull=True)
+        self.assertEqual(ids, sorted(expected.values_list('id', flat=True)))
+
+        ids, _ = self.collect(f'{self.url}?user={self.student.pk}&graded=true')
+        expected = Submission.objects.filter(user=self.student, grade__isnull=False)
+        self.assertEqual(ids, sorted(expected.values_list('id', flat=True)))
+
+        self.assertEqual(self.client.get(self.url, {'graded': 'maybe'}).status_code, 400)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 404)
+
+
+class SubmissionExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        cls.student = User.objects.create_user(email='student@example.com', name='Student, Jr.', password='pass')
+        topic = Topic.objects.create(title='Agents')
+        cls.task = Task.objects.create(topic=topic, title='Planner')
+        Submission.objects.create(task=cls.task, user=cls.student, file='submissions/a.py', grade=90)
+        Submission.objects.create(task=cls.task, user=cls.student, file='submissions/b.py')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('submission-export')
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = self.content(self.client.get(self.url)).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['grade'] for row in rows], [90, None])
+        self.assertEqual(rows[0]['user_email'], 'student@example.com')
+        self.assertEqual(rows[0]['task_title'], 'Planner')
+
+    def test_csv_with_filters(self):
+        response = self.client.get(self.url, {'format': 'csv', 'graded': 'true'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+        self.assertEqual(rows[0][:3], ['id', 'user_email', 'user_name'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], 'Student, Jr.')
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class BulkGradeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Planner')
+        Submission.objects.bulk_create([
+            Submission(task=task, user=student, file=f'submissions/{i}.py', grade=50 if i == 0 else None)
+            for i in range(2000)
+        ])
+        cls.ids = list(Submission.objects.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('submission-bulk-grade')
+
+    def test_json_batch(self):
+        rows = [{'id': pk, 'grade': i % 100} for i, pk in enumerate(self.ids)]
+        rows[0]['grade'] = 50
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = [row['status'] for row in response.data['results']]
+        self.assertEqual(statuses[:2], ['unchanged', 'updated'])
+        self.assertEqual(len(statuses), 2000)
+        self.assertEqual(Submission.objects.get(pk=self.ids[99]).grade, 99)
+
+    def test_csv_body_and_upload(self):
+        body = f'id,grade\n{self.ids[1]},70\n{self.ids[0]},\n'
+        response = self.client.generic('POST', self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Submission.objects.get(pk=self.ids[1]).grade, 70)
+        self.assertIsNone(Submission.objects.get(pk=self.ids[0]).grade)
+
+        upload = SimpleUploadedFile('grades.csv', f'id,grade\n{self.ids[2]},80\n'.encode())
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Submission.objects.get(pk=self.ids[2]).grade, 80)
+
+    def test_invalid_rows_reject_whole_batch(self):
+        rows = [{'id': self.ids[1], 'grade': 10}, {'id': 'x', 'grade': 1}, {'id': 10 ** 9, 'grade': 1},
+                {'id': self.ids[1], 'grade': 20}]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([int(error['row']) for error in response.json()['rows']], [1, 2, 3])
+        self.assertIsNone(Submission.objects.get(pk=self.ids[1]).grade)
+
+    def test_malformed_integers_are_row_errors(self):
+        rows = [{'id': '--5', 'grade': 1}, {'id': self.ids[1], 'grade': '\u00b2'},
+                {'id': self.ids[2], 'grade': 2 ** 40}, {'id': f' {self.ids[3]} ', 'grade': '-0'}]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([int(error['row']) for error in response.json()['rows']], [0, 1, 2])
+
+    def test_bad_csv_upload_is_bad_request(self):
+        for content in (b'id,grade\n\xff\xfe,1\n', b'id,grade\n' + b'9' * 200000 + b',1\n'):
+            upload = SimpleUploadedFile('grades.csv', content)
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400, content)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.get(email='student@example.com'))
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 403)
+
+
+class TempMediaMixin:
+
+    def use_temp_media(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media, CHUNKED_UPLOAD_DIR=os.path.join(media, '.uploads'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return media
+
+
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        cls.task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Planner')
+
+    def setUp(self):
+        self.use_temp_media()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.payload = os.urandom(300 * 1024)
+
+    def start(self, payload=None, sha256=None):
+        payload = payload or self.payload
+        response = self.client.post(reverse('upload-list'), {
+            'target': 'submission', 'task': self.task.pk, 'filename': 'agent.py',
+            'size': len(payload), 'sha256': sha256 or hashlib.sha256(payload).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return reverse('upload-detail', kwargs={'pk': response.data['id']})
+
+    def put_chunk(self, url, start, end):
+        return self.client.generic('PUT', url, self.payload[start:end], content_type='application/octet-stream',
+                                   HTTP_CONTENT_RANGE=f'bytes {start}-{end - 1}/{len(self.payload)}')
+
+    def test_resume_and_finalize(self):
+        url = self.start()
+        self.assertEqual(self.put_chunk(url, 0, 100000).data['offset'], 100000)
+        # A retried or skipped chunk is refused and reports where to resume.
+        conflict = self.put_chunk(url, 200000, len(self.payload))
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(self.client.get(url).data['offset'], 100000)
+
+        self.put_chunk(url, 100000, len(self.payload))
+        response = self.client.post(url + 'finalize/')
+        self.assertEqual(response.status_code, 201)
+        submission = Submission.objects.get(pk=response.data['id'])
+        self.assertEqual(submission.user, self.student)
+        with submission.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.payload)
+        self.assertEqual(os.listdir(settings.CHUNKED_UPLOAD_DIR), [])
+
+    def test_concurrent_finalize_attaches_once(self):
+        url = self.start()
+        self.put_chunk(url, 0, len(self.payload))
+        # This request loaded the upload, then another one finalized it first.
+        stale = ChunkedUpload.objects.get()
+        ChunkedUpload.objects.filter(pk=stale.pk).update(status=ChunkedUpload.COMPLETE)
+        with mock.patch.object(ChunkedUploadViewSet, 'get_object', return_value=stale):
+            self.assertEqual(self.client.post(url + 'finalize/').status_code, 409)
+        self.assertFalse(Submission.objects.exists())
+
+    def test_finalize_rejects_incomplete_and_bad_checksum(self):
+        url = self.start(sha256='0' * 64)
+        self.put_chunk(url, 0, 1000)
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 409)
+        self.put_chunk(url, 1000, len(self.payload))
+        self.assertEqual(self.client.post(url + 'finalize/').status_code, 422)
+        self.assertFalse(Submission.objects.exists())
+
+    def test_attachment_requires_staff(self):
+        response = self.client.post(reverse('upload-list'), {
+            'target': 'task_attachment', 'task': self.task.pk, 'filename': 'spec.pdf', 'size': 1, 'sha256': '0' * 64,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cleanup_removes_stale_uploads(self):
+        url = self.start()
+        self.put_chunk(url, 0, 1000)
+        ChunkedUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('cleanup_uploads', stdout=io.StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(settings.CHUNKED_UPLOAD_DIR), [])
+
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        cls.task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Planner')
+
+    def setUp(self):
+        self.media = self.use_temp_media()
+
+    def submit(self, content, filename='agent.py'):
+        submission = Submission(task=self.task, user=self.student)
+        submission.file.save(filename, ContentFile(content))
+        return submission
+
+    def test_identical_files_share_one_blob(self):
+        first, second = self.submit(b'print(1)'), self.submit(b'print(1)', 'copy.py')
+        other = self.submit(b'print(2)')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        self.assertEqual(Blob.objects.get(name=first.file.name).refcount, 2)
+
+        path = first.file.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.filter(name=second.file.name).exists())
+
+    def test_replacing_attachment_releases_old_blob(self):
+        self.task.attachment.save('spec.txt', ContentFile(b'v1'))
+        old_path = self.task.attachment.path
+        task = Task.objects.get(pk=self.task.pk)
+        task.attachment.save('spec.txt', ContentFile(b'v2'))
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(task.attachment.path))
+
+    def test_migrate_existing_tree(self):
+        os.makedirs(os.path.join(self.media, 'submissions'))
+        for i, content in enumerate([b'starter', b'starter', b'mine']):
+            with open(os.path.join(self.media, 'submissions', f'{i}.py'), 'wb') as fh:
+                fh.write(content)
+            Submission.objects.create(task=self.task, user=self.student, file=f'submissions/{i}.py')
+
+        out = io.StringIO()
+        call_command('migrate_to_cas', stdout=out)
+        self.assertIn('saving 7 bytes', out.getvalue())
+        names = list(Submission.objects.order_by('id').values_list('file', flat=True))
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(os.listdir(os.path.join(self.media, 'submissions')), [])
+        self.assertEqual(Blob.objects.get(name=names[0]).refcount, 2)
+
+
+def run_grade_worker(workers):
+    # The worker drops its connections before forking and between polls,
+    # which on Postgres would also drop the test case's transaction.
+    with mock.patch.object(grade_worker, 'close_old_connections'), \
+            mock.patch.object(grade_worker.connections, 'close_all'):
+        call_command('grade_worker', '--once', '--workers', str(workers), stdout=io.StringIO())
+
+
+class GradingQueueTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        cls.task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Echo')
+        GradingTestCase.objects.create(task=cls.task, index=0, input_text='hello\n', expected_output='HELLO')
+        GradingTestCase.objects.create(task=cls.task, index=1, input_text='agent\n', expected_output='AGENT', weight=3)
+
+    def setUp(self):
+        self.use_temp_media()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def submit(self, source):
+        upload = SimpleUploadedFile('solution.py', source.encode())
+        response = self.client.post(reverse('submission-list'), {'task': self.task.pk, 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_create_enqueues_and_worker_grades(self):
+        passing = self.submit('print(input().upper())')
+        partial = self.submit('s = input()\nprint(s.upper() if s == "agent" else s)')
+        self.assertEqual(GradingRun.objects.filter(status=GradingRun.PENDING).count(), 2)
+
+        run_grade_worker(2)
+        self.assertEqual(Submission.objects.get(pk=passing).grade, 100)
+        self.assertEqual(Submission.objects.get(pk=partial).grade, 75)
+        run = GradingRun.objects.get(submission_id=partial)
+        self.assertEqual(run.status, GradingRun.DONE)
+        self.assertEqual([test['status'] for test in run.report['tests']], ['failed', 'passed'])
+
+    def test_staff_grades_are_kept(self):
+        manual = self.submit('print(input().upper())')
+        automatic = self.submit('print(input().upper())')
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_superuser(email='ta@example.com', name='TA', password='pass'))
+        response = staff.post(reverse('submission-bulk-grade'), [{'id': manual, 'grade': 40}], format='json')
+        self.assertEqual(response.status_code, 200)
+
+        run_grade_worker(1)
+        self.assertEqual(Submission.objects.get(pk=manual).grade, 40)
+        self.assertEqual(Submission.objects.get(pk=automatic).grade, 100)
+        self.assertTrue(Submission.objects.get(pk=automatic).auto_graded)
+
+        # A regrade replaces the automatic grade, never the staff one.
+        for pk in (manual, automatic):
+            grading.finish_run(GradingRun.objects.filter(submission_id=pk).get().pk, 25.0, {})
+        self.assertEqual(Submission.objects.get(pk=manual).grade, 40)
+        self.assertEqual(Submission.objects.get(pk=automatic).grade, 25)
+
+        staff.patch(reverse('submission-detail', kwargs={'pk': automatic}), {'grade': 90}, format='json')
+        self.assertFalse(Submission.objects.get(pk=automatic).auto_graded)
+
+    def test_deleted_submission_mid_run(self):
+        submission = self.submit('print(1)')
+        [run] = grading.claim_runs(1)
+        Submission.objects.filter(pk=submission).delete()
+        self.assertIsNone(grading.finish_run(run.pk, 100.0, {}))
+
+    def test_runs_on_private_copy(self):
+        source = 'import os\nprint(os.listdir(".") == ["solution.py"] and "blobs" not in os.getcwd())'
+        GradingTestCase.objects.filter(task=self.task).update(input_text='', expected_output='True')
+        submission = self.submit(source)
+        run_grade_worker(1)
+        self.assertEqual(Submission.objects.get(pk=submission).grade, 100)
+
+    def test_task_pass_threshold_stops_early(self):
+        Task.objects.filter(pk=self.task.pk).update(pass_threshold=1.0)
+        # Fails the quick case; the slow one cannot change the outcome.
+        source = 's = input()\nif s == "agent":\n    import time; time.sleep(30)\nprint(s)'
+        submission = self.submit(source)
+        run_grade_worker(1)
+        self.assertEqual(Submission.objects.get(pk=submission).grade, 0)
+        report = GradingRun.objects.get(submission_id=submission).report
+        self.assertTrue(report['stopped_early'])
+        self.assertLess(report['wall_time'], 10)
+
+    def test_claims_are_exclusive(self):
+        for _ in range(5):
+            self.submit('print(1)')
+        first = grading.claim_runs(3, worker='a')
+        second = grading.claim_runs(3, worker='b')
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({run.pk for run in first} & {run.pk for run in second})
+        self.assertEqual(grading.claim_runs(3), [])
+
+    def test_stale_runs_are_requeued_then_failed(self):
+        self.submit('print(1)')
+        grading.claim_runs(1)
+        GradingRun.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(grading.requeue_stale_runs(timedelta(minutes=10), max_attempts=2), (1, 0))
+        grading.claim_runs(1)
+        GradingRun.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(grading.requeue_stale_runs(timedelta(minutes=10), max_attempts=2), (0, 1))
+        self.assertEqual(GradingRun.objects.get().status, GradingRun.FAILED)
+
+
+class SandboxRunnerTests(SimpleTestCase):
+    limits = sandbox.Limits(cpu_seconds=1, wall_seconds=2, memory_bytes=256 * 1024 * 1024, output_bytes=4096)
+
+    def run_source(self, source, testcases=None, **kwargs):
+        testcases = testcases or [{'input': 'agent\n', 'expected': 'AGENT'}]
+        runner = sandbox.Runner([sys.executable, '-c', source], limits=self.limits, **kwargs)
+        return runner.run(testcases)
+
+    def test_statuses(self):
+        cases = {
+            'print(input().upper())': sandbox.PASSED,
+            'print(input())': sandbox.FAILED,
+            'raise SystemExit(3)': sandbox.ERROR,
+            'while True: pass': sandbox.CPU_LIMIT,
+            'import time; time.sleep(30)': sandbox.TIMEOUT,
+            'data = bytearray(1024 ** 3)': sandbox.MEMORY_LIMIT,
+            'print("x" * 100000)': sandbox.OUTPUT_LIMIT,
+        }
+        for source, expected in cases.items():
+            with self.subTest(source=source):
+                test = self.run_source(source).tests[0]
+                self.assertEqual(test.status, expected)
+                self.assertGreater(test.wall_time, 0)
+
+    def test_weighted_score(self):
+        report = self.run_source('print(input())', [
+            {'input': 'a', 'expected': 'a', 'weight': 3},
+            {'input': 'b', 'expected': 'c'},
+        ], max_workers=2)
+        self.assertEqual(report.score, 75.0)
+        self.assertFalse(report.stopped_early)
+
+    def test_stops_once_failure_decides_score(self):
+        source = 'import time\ns = input()\ntime.sleep(0 if s == "bad" else 1)\nprint(s)'
+        testcases = [{'input': 'bad', 'expected': 'x'}] + [{'input': 'ok', 'expected': 'ok'}] * 8
+        report = self.run_source(source, testcases, max_workers=2, pass_threshold=1.0)
+        self.assertTrue(report.stopped_early)
+        self.assertEqual(report.score, 0.0)
+        self.assertLess(report.wall_time, 1)
+        self.assertIn(sandbox.SKIPPED, [test.status for test in report.tests])
+
+    def test_child_gets_minimal_environment_and_process_cap(self):
+        source = 'import os, resource\nprint(sorted(os.environ), resource.getrlimit(resource.RLIMIT_NPROC))'
+        expected = "['HOME', 'LANG', 'PATH', 'PYTHONDONTWRITEBYTECODE', 'PYTHONIOENCODING'] (64, 64)"
+        with mock.patch.dict(os.environ, {'SECRET_KEY': 'do-not-leak'}):
+            report = self.run_source(source, [{'expected': expected}])
+        self.assertEqual(report.tests[0].status, sandbox.PASSED, report.tests[0].stderr)
+
+    def test_protect_directory_drops_other_access(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        media = os.path.join(root, 'media')
+        os.makedirs(media, mode=0o755)
+        with open(os.path.join(media, 'blob'), 'w') as f:
+            f.write('secret')
+        os.chmod(os.path.join(media, 'blob'), 0o644)
+        sandbox.protect_directory(media, group=str(os.getgid()))
+        mode = os.stat(media).st_mode & 0o777
+        self.assertEqual(mode, 0o750)
+        self.assertEqual(os.stat(media).st_gid, os.getgid())
+        if os.geteuid() == 0 and shutil.which('setpriv'):
+            os.chmod(root, 0o755)
+            result = subprocess.run(
+                ['setpriv', '--reuid=nobody', '--regid=nogroup', '--clear-groups', 'cat', os.path.join(media, 'blob')],
+                capture_output=True,
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertNotIn(b'secret', result.stdout)
+
+
+class PromptEvaluationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Shout')
+        GradingTestCase.objects.create(task=cls.task, index=0, input_text='hello agent', expected_output='HELLO AGENT')
+        GradingTestCase.objects.create(task=cls.task, index=1, input_text='tools', expected_output='TOOLS')
+        prompts = ['Answer in uppercase.', 'Reverse the text.', 'Please reply in UPPERCASE letters:']
+        users = User.objects.bulk_create([User(email=f's{i}@example.com', name=f'S{i}') for i in range(30)])
+        Submission.objects.bulk_create([
+            Submission(task=cls.task, user=user, prompt_text=prompts[i % 3]) for i, user in enumerate(users)
+        ])
+
+    def setUp(self):
+        self.server = MockModelServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = HTTPModelClient(self.server.base_url)
+
+    def test_cohort_evaluation_is_cached(self):
+        submissions = Submission.objects.all()
+        stats = evaluation.evaluate_submissions(submissions, self.client, model='mock', concurrency=4)
+        self.assertEqual((stats.submissions, stats.lookups), (30, 60))
+        self.assertEqual((stats.model_calls, stats.cache_hits, stats.deduplicated), (6, 0, 54))
+        self.assertEqual(self.server.calls, 6)
+        grades = sorted(set(Submission.objects.values_list('grade', flat=True)))
+        self.assertEqual(grades, [0, 100])
+
+        again = evaluation.evaluate_submissions(submissions, self.client, model='mock', concurrency=4)
+        self.assertEqual((again.model_calls, again.cache_hits), (0, 60))
+        self.assertEqual(again.hit_rate, 1.0)
+        self.assertEqual(self.server.calls, 6)
+        self.assertEqual(GradingRun.objects.filter(status=GradingRun.DONE).count(), 60)
+
+    def test_other_model_is_not_a_hit(self):
+        submission = Submission.objects.first()
+        evaluation.evaluate_submissions([submission], self.client, model='mock')
+        stats = evaluation.evaluate_submissions([submission], self.client, model='mock-large')
+        self.assertEqual(stats.model_calls, 2)
+
+    def test_api_prompt_submission_is_queued_and_graded(self):
+        student = User.objects.get(email='s0@example.com')
+        client = APIClient()
+        client.force_authenticate(student)
+        response = client.post(reverse('submission-list'), {'task': self.task.pk, 'prompt_text': 'Answer in uppercase.'})
+        self.assertEqual(response.status_code, 201)
+        run = GradingRun.objects.get(submission_id=response.data['id'])
+        self.assertEqual(run.status, GradingRun.PENDING)
+
+        run_grade_worker(1)
+        run.refresh_from_db()
+        self.assertEqual(run.status, GradingRun.DONE)
+        self.assertEqual(GradingRun.objects.filter(submission_id=response.data['id']).count(), 1)
+        self.assertEqual(Submission.objects.get(pk=response.data['id']).grade, 100)
+
+    def test_whole_response_must_match(self):
+        self.assertTrue(evaluation.response_matches(' HELLO\n  AGENT ', 'HELLO AGENT'))
+        for response in ('14', 'not 4', '4 or 5'):
+            self.assertFalse(evaluation.response_matches(response, '4'))
+
+    def test_model_errors_fail_the_run(self):
+        self.server.stop()
+        submission = Submission.objects.first()
+        stats = evaluation.evaluate_submissions([submission], HTTPModelClient(self.server.base_url, timeout=1))
+        self.assertEqual(stats.errors, 2)
+        self.assertEqual(GradingRun.objects.get().status, GradingRun.FAILED)
+        self.assertFalse(ModelResponse.objects.exists())
+
+
+class CompiledSerializerTests(TempMediaMixin, TestCase):
+    """The compiled read path must render exactly what the DRF serializers render."""
+
+    def setUp(self):
+        cache.clear()
+        self.use_temp_media()
+        self.staff = User.objects.create_user(email='staff@example.com', name='Staff', password='pass')
+        self.staff.is_admin = True
+        self.staff.save()
+        for i in range(3):
+            topic = Topic.objects.create(title=f'Topic {i}', description='caf\u00e9 "quoted"')
+            Video.objects.create(topic=topic, title=f'Video {i}', video_url=None if i else 'https://example.com/v')
+            task = Task.objects.create(topic=topic, title=f'Task {i}', creator=self.staff if i else None)
+            if i:
+                task.attachment.save('spec.txt', ContentFile(f'spec {i}'.encode()))
+            Submission.objects.create(task=task, user=self.staff, file=ContentFile(b'print(1)', name='a.py'), grade=i or None)
+            Submission.objects.create(task=task, user=self.staff, prompt_text='Plan the trip.')
+        Topic.objects.create(title='Empty')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def assertMatchesSerializer(self, url, serializer_class, instance, many=False):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = serializer_class(instance, many=many, context={'request': response.wsgi_request}).data
+        if 'results' in response.data:
+            self.assertEqual(response.content, JSONRenderer().render(dict(response.data, results=data)))
+        else:
+            self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_output_is_byte_identical(self):
+        topic = Topic.objects.first()
+        task = Task.objects.exclude(attachment='').first()
+        cases = [
+            (reverse('topics-list'), TopicSerializer, Topic.objects.all(), True),
+            (reverse('topics-detail', kwargs={'pk': topic.pk}), TopicSerializer, topic, False),
+            (reverse('topic-videos', kwargs={'pk': topic.pk}), TopicWithVideosSerializer, topic, False),
+            (reverse('topic-tasks', kwargs={'pk': topic.pk}), TopicWithTasksSerializer, topic, False),
+            (reverse('video-list'), VideoSerializer, Video.objects.all(), True),
+            (reverse('task-list'), TaskSerializer, Task.objects.all(), True),
+            (reverse('task-detail', kwargs={'pk': task.pk}), TaskSerializer, task, False),
+            (reverse('submission-list'), SubmissionSerializer, Submission.objects.order_by('submitted_at', 'id'), True),
+        ]
+        for url, serializer_class, instance, many in cases:
+            with self.subTest(url=url):
+                self.assertMatchesSerializer(url, serializer_class, instance, many)
+
+    def test_all_course_read_serializers_compile(self):
+        for serializer_class in (TopicSerializer, TopicWithVideosSerializer, TopicWithTasksSerializer,
+                                 VideoSerializer, TaskSerializer, SubmissionSerializer):
+            self.assertIsNotNone(compile_serializer(serializer_class), serializer_class.__name__)
+
+    def test_missing_object_is_404(self):
+        response = self.client.get(reverse('topics-detail', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, 404)
+
+
+class FastJSONTests(SimpleTestCase):
+    payload = {
+        'id': 7,
+        'title': 'caf\u00e9 \u2028 line \u2029 para',
+        'when': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        'day': date(2025, 1, 2),
+        'score': Decimal('9.50'),
+        'token': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'label': gettext_lazy('Password'),
+        'nested': [{'ok': True, 'none': None, 'ratio': 0.25}, [1, 2, 3]],
+        3: 'int key',
+    }
+
+    def test_matches_stock_renderer(self):
+        for media_type in (None, 'application/json; indent=2'):
+            with self.subTest(media_type=media_type):
+                self.assertEqual(
+                    FastJSONRenderer().render(self.payload, media_type, {}),
+                    JSONRenderer().render(self.payload, media_type, {}),
+                )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_user_renderer_envelope(self):
+        error = {'email': [ErrorDetail('This field is required.', code='required')]}
+        raised = Response(error, status=400)
+        raised.exception = True
+        self.assertEqual(json.loads(UserRenderer().render(error, None, {'response': raised})), {'errors': {'email': ['This field is required.']}})
+
+        # Hand-built error bodies and successes are left as they are.
+        plain = {'errors': {'non_field_errors': ['Email or Password is not Valid']}}
+        self.assertEqual(json.loads(UserRenderer().render(plain, None, {'response': Response(plain, status=404)})), plain)
+        self.assertEqual(json.loads(UserRenderer().render({'msg': 'ok'}, None, {'response': Response(status=200)})), {'msg': 'ok'})
+
+    def test_parser_matches_stock_parser(self):
+        body = json.dumps({'title': 'caf\u00e9', 'rows': [1, 2.5, None]}).encode()
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for invalid in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError) as fast:
+                FastJSONParser().parse(io.BytesIO(invalid))
+            with self.assertRaises(ParseError) as stock:
+                JSONParser().parse(io.BytesIO(invalid))
+            self.assertEqual(str(fast.exception), str(stock.exception))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_HEALTH_CHECK_INTERVAL=60)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only; no query is sent to the named aliases."""
+
+    def setUp(self):
+        cache.clear()
+        db_router.health.reset()
+        patcher = mock.patch.object(db_router, 'check_replica', return_value=True)
+        self.check_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = db_router.ReplicaRouter()
+
+    def request(self, method='get', auth='Bearer one', write=False):
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Topic)
+            if write:
+                seen['write'] = self.router.db_for_write(Submission)
+                seen['after_write'] = self.router.db_for_read(Topic)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/api/course/topics/', HTTP_AUTHORIZATION=auth)
+        db_router.ReplicaRoutingMiddleware(view)(request)
+        return seen
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertEqual({self.request()['read'] for _ in range(4)}, {'replica1', 'replica2'})
+        self.assertIsNone(self.request(method='post')['read'])
+
+    def test_outside_requests_and_other_apps_use_primary(self):
+        self.assertIsNone(self.router.db_for_read(Topic))
+        token = db_router.current_state.set(db_router.RoutingState(use_replica=True))
+        try:
+            self.assertIsNone(self.router.db_for_read(ContentType))
+            self.assertIn(self.router.db_for_read(User), ('replica1', 'replica2'))
+        finally:
+            db_router.current_state.reset(token)
+
+    def test_writer_is_pinned_to_primary(self):
+        seen = self.request(method='post', write=True)
+        self.assertEqual(seen['write'], 'default')
+        self.assertIsNone(self.request()['read'])
+        self.assertIsNotNone(self.request(auth='Bearer two')['read'])
+        cache.clear()
+        self.assertIsNotNone(self.request()['read'])
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        seen = self.request(write=True)
+        self.assertIsNotNone(seen['read'])
+        self.assertIsNone(seen['after_write'])
+
+    def test_unhealthy_replicas_are_skipped(self):
+        self.check_replica.side_effect = lambda alias: alias == 'replica1'
+        self.assertEqual({self.request()['read'] for _ in range(4)}, {'replica1'})
+        self.assertEqual(self.check_replica.call_count, 2)
+
+        db_router.health.reset()
+        self.check_replica.side_effect = lambda alias: False
+        self.assertIsNone(self.request()['read'])
+
+    def test_request_keeps_one_replica(self):
+        reads = []
+
+        def view(request):
+            reads.extend(self.router.db_for_read(Topic) for _ in range(5))
+            return HttpResponse()
+
+        for _ in range(2):
+            db_router.ReplicaRoutingMiddleware(view)(RequestFactory().get('/api/course/topics/'))
+        self.assertEqual(len(set(reads[:5])), 1)
+        self.assertEqual(set(reads), {'replica1', 'replica2'})
+        self.assertEqual(self.check_replica.call_count, 2)
+
+    def test_concurrent_probes_are_shared(self):
+        release = threading.Event()
+        self.check_replica.side_effect = lambda alias: release.wait(5)
+        threads = [threading.Thread(target=db_router.health.is_healthy, args=('replica1',)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)  # let the others queue behind the first probe
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.check_replica.call_count, 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertIsNone(self.request()['read'])
+        self.assertTrue(self.router.allow_migrate('default', 'course'))
+
+
+class PoolStatsTests(TestCase):
+
+    def test_staff_only(self):
+        student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        client = APIClient()
+        client.force_authenticate(student)
+        self.assertEqual(client.get(reverse('db-pool-stats')).status_code, 403)
+
+        student.is_admin = True
+        student.save()
+        response = client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pools'], {'default': None})
+        self.assertEqual(response.json()['pid'], os.getpid())
+
+    def test_pool_counters(self):
+        pool = mock.Mock(closed=False)
+        pool.get_stats.return_value = {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1,
+            'requests_waiting': 3, 'connections_num': 6, 'requests_num': 40,
+        }
+        with mock.patch.object(type(db_pool.connections['default']), 'pool', pool, create=True):
+            stats = db_pool.pool_stats('default')
+        self.assertEqual((stats['in_use'], stats['waiting'], stats['created']), (3, 3, 6))
+
+
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        topic = Topic.objects.create(title='Agents')
+        Video.objects.create(topic=topic, title='Intro')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.client = APIClient()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_records_route_queries_and_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('topics-list'))
+        query_count = len(queries)
+        timing = dict(part.strip().split(';dur=') for part in response['Server-Timing'].split(','))
+        self.assertEqual(set(timing), {'db', 'serialize', 'total'})
+        self.assertGreaterEqual(float(timing['total']), float(timing['db']))
+
+        lines = self.scrape()
+        labels = 'route="topics-list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 1', lines)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 1', lines)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', lines)
+        self.assertIn(f'http_request_db_queries_total{{{labels}}} {query_count}', lines)
+        self.assertIn(f'http_response_bytes_total{{{labels}}} {len(response.content)}', lines)
+
+    def test_unresolved_paths_share_one_route(self):
+        self.client.get('/no/such/page/1')
+        self.client.get('/no/such/page/2')
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="404"} 2', self.scrape())
+
+    def test_aggregates_worker_snapshots(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = {
+            'series': [['topics-list', 'GET', 2, 0.5, [1, 1] + [0] * len(metrics.BUCKETS[1:]), 6, 0.01, 100]],
+            'statuses': [['topics-list', 'GET', 200, 2]],
+        }
+        with open(os.path.join(directory, 'metrics-999999.json'), 'w') as fh:
+            json.dump(other, fh)
+
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('topics-list'))
+            lines = self.scrape()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+        self.assertIn('http_requests_total{route="topics-list",method="GET",status="200"} 3', lines)
+        self.assertIn('http_request_duration_seconds_count{route="topics-list",method="GET"} 3', lines)
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        topic = Topic.objects.create(title='Agents')
+        task = Task.objects.create(topic=topic, title='Planner', creator=cls.admin)
+        Submission.objects.create(task=task, user=cls.student, prompt_text='plan')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('submission-list')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_staff_trace_report(self):
+        client = self.client_for(self.admin)
+        response = client.get(self.url, HTTP_X_PROFILE='trace')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+
+        report = client.get(reverse('profile-detail', args=[profile_id])).json()
+        self.assertEqual((report['mode'], report['unit'], report['status']), ('trace', 'microseconds', 200))
+        self.assertEqual(report['sql_count'], len(report['sql']))
+        submission_query = next(query for query in report['sql'] if 'course_submission' in query['sql'])
+        self.assertTrue(any(frame.startswith('course/') for frame in submission_query['origin']))
+        self.assertTrue(any('course/views.py:' in stack for stack, weight in report['stacks']))
+
+        stacks = client.get(reverse('profile-stacks', args=[profile_id]))
+        self.assertTrue(stacks['Content-Type'].startswith('text/plain'))
+        for line in stacks.content.decode().splitlines():
+            stack, weight = line.rsplit(' ', 1)
+            self.assertGreater(int(weight), 0)
+
+    def test_query_flag_samples(self):
+        client = self.client_for(self.admin)
+        response = client.get(self.url, {'_profile': '1'})
+        report = profiling.load_report(response['X-Profile-Id'])
+        self.assertEqual((report['mode'], report['unit']), ('sample', 'samples'))
+        self.assertGreater(report['sql_count'], 0)
+
+    def test_students_are_not_profiled(self):
+        client = self.client_for(self.student)
+        response = client.get(self.url, HTTP_X_PROFILE='trace')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(client.get(reverse('profile-detail', args=['0' * 32])).status_code, 403)
+
+    def test_unflagged_requests_skip_profiler(self):
+        client = self.client_for(self.admin)
+        with mock.patch.object(profiling.ProfilingMiddleware, 'profile') as profile, \
+                mock.patch.object(profiling, 'is_staff') as is_staff:
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        profile.assert_not_called()
+        is_staff.assert_not_called()
+
+    def test_expired_profile(self):
+        response = self.client_for(self.admin).get(reverse('profile-detail', args=['0' * 32]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiDocsTests(TestCase):
+
+    def setUp(self):
+        api_docs.schema_cache.clear()
+        self.addCleanup(api_docs.schema_cache.clear)
+        from drf_yasg.generators import OpenAPISchemaGenerator
+        # Called once per endpoint, i.e. only when views are introspected.
+        patcher = mock.patch.object(OpenAPISchemaGenerator, 'get_operation', autospec=True,
+                                    side_effect=OpenAPISchemaGenerator.get_operation)
+        self.get_operation = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_document_generated_once_per_urlconf(self):
+        first = self.client.get(reverse('schema-json'))
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('/course/topics/', first.json()['paths'])
+        operations = self.get_operation.call_count
+        self.assertGreater(operations, 0)
+        self.assertEqual(self.client.get(reverse('schema-json')).content, first.content)
+        self.assertEqual(self.client.get('/swagger/?format=openapi').status_code, 200)
+        self.assertEqual(self.get_operation.call_count, operations)
+
+        clear_url_caches()
+        self.client.get(reverse('schema-json'))
+        self.assertEqual(self.get_operation.call_count, 2 * operations)
+
+    def test_ui_pages_load_document_url(self):
+        for name in ('schema-swagger-ui', 'schema-redoc'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(reverse('schema-json'), response.content.decode())
+        self.assertEqual(self.get_operation.call_count, 0)
+
+    def test_export_matches_served_document(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'openapi.json')
+        call_command('export_openapi', output=path, stdout=io.StringIO())
+        with open(path) as fh:
+            exported = json.load(fh)
+        served = self.client.get(reverse('schema-json')).json()
+        self.assertNotIn('host', exported)
+        self.assertEqual(exported, served)
+
+    @override_settings(ALLOWED_HOSTS=['*'])
+    def test_host_header_does_not_key_the_cache(self):
+        for host in ('a.example', 'b.example', 'c.example'):
+            response = self.client.get(reverse('schema-json'), HTTP_HOST=host)
+            self.assertNotIn('host', response.json())
+            self.client.get('/swagger/?format=openapi', HTTP_HOST=host)
+        self.assertEqual(set(api_docs.schema_cache.entries), {'document', 'json'})
+
+    @override_settings(OPENAPI_URL='https://docs.example')
+    def test_document_embeds_configured_url(self):
+        self.assertEqual(self.client.get(reverse('schema-json')).json()['host'], 'docs.example')
+
+    def test_urlconf_does_not_import_drf_yasg(self):
+        code = ('import sys, django; django.setup(); import AiAgentWeb.urls; '
+                'print(sorted(m for m in sys.modules if m.startswith("drf_yasg.")))')
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'AiAgentWeb.settings'})
+        self.assertEqual(result.stdout.strip(), '[]', result.stderr)
+
+
+class BootTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overrides = override_settings(
+            STATIC_ROOT=directory,
+            OPENAPI_SCHEMA_FILE=os.path.join(directory, 'openapi.json'),
+            BOOT_STATE_FILE=os.path.join(directory, '.boot-state.json'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def boot(self, *args):
+        out = io.StringIO()
+        call_command('boot', *args, stdout=out)
+        return dict(line.split()[:2] for line in out.getvalue().splitlines()[1:-1])
+
+    def test_second_boot_skips_finished_work(self):
+        self.assertEqual(self.boot(), {'migrate': 'up', 'collectstatic': 'done', 'openapi': 'done'})
+        self.assertTrue(os.path.exists(os.path.join(settings.STATIC_ROOT, 'admin', 'css', 'base.css')))
+        self.assertTrue(os.path.exists(settings.OPENAPI_SCHEMA_FILE))
+        self.assertEqual(self.boot(), {'migrate': 'up', 'collectstatic': 'up', 'openapi': 'up'})
+
+        os.remove(settings.OPENAPI_SCHEMA_FILE)
+        with mock.patch.object(boot, 'static_fingerprint', return_value='changed'):
+            self.assertEqual(self.boot(), {'migrate': 'up', 'collectstatic': 'done', 'openapi': 'done'})
+
+    def test_several_workers_need_a_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis'}}
+        with override_settings(CACHES=locmem):
+            self.assertIsNone(boot.shared_cache_problem(1))
+            self.assertIn('CACHE_URL', boot.shared_cache_problem(2))
+        with override_settings(CACHES=redis):
+            self.assertIsNone(boot.shared_cache_problem(4))
+
+    def test_migrates_only_when_pending(self):
+        with mock.patch('course.management.commands.boot.call_command') as run:
+            self.boot()
+            self.assertNotIn(mock.call('migrate', database='default', interactive=False, verbosity=0),
+                             run.call_args_list)
+            with mock.patch.object(boot, 'pending_migrations', return_value=[('migration', False)]):
+                self.boot()
+            run.assert_any_call('migrate', database='default', interactive=False, verbosity=0)
+
+    def test_lock_serializes_boots(self):
+        acquired = threading.Event()
+
+        def other_replica():
+            with boot.boot_lock():
+                acquired.set()
+
+        with boot.boot_lock():
+            thread = threading.Thread(target=other_replica)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_warm_up_compiles_serializers_without_queries(self):
+        _compiled.clear()
+        with self.assertNumQueries(0):
+            boot.warm_up()
+        self.assertIsNotNone(_compiled[TopicSerializer])
+
+    def test_first_request_report_ignores_probes(self):
+        log = mock.Mock()
+        patcher = mock.patch.object(boot, 'first_request_at', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        boot.report_first_request(log)
+        self.addCleanup(request_started.disconnect, dispatch_uid='boot-first-request')
+        self.assertEqual(self.client.get(reverse('ready')).json()['ready'], True)
+        log.info.assert_not_called()
+        self.client.get(reverse('topics-list'))
+        self.client.get(reverse('topics-list'))
+        log.info.assert_called_once()
+        self.assertIsNotNone(self.client.get(reverse('ready')).json()['first_request_seconds'])
+
+    def test_not_ready_without_database(self):
+        with mock.patch.object(boot.connections['default'], 'cursor', side_effect=DatabaseError('down')):
+            response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['database'], 'down')
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+class DownloadTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='ta@example.com', name='TA', password='pass')
+        cls.student = User.objects.create_user(email='student@example.com', name='Student', password='pass')
+        cls.other = User.objects.create_user(email='other@example.com', name='Other', password='pass')
+        cls.task = Task.objects.create(topic=Topic.objects.create(title='Agents'), title='Planner')
+
+    def setUp(self):
+        self.use_temp_media()
+        cache.clear()
+        self.submission = Submission(task=self.task, user=self.student)
+        self.submission.file.save('agent.py', ContentFile(b'print(1)'))
+        self.url = reverse('submission-download', kwargs={'pk': self.submission.pk})
+        self.client = APIClient()
+
+    def test_owner_gets_accel_redirect(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.submission.file.name)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="submission-{self.submission.pk}.py"')
+        self.assertEqual(response['Content-Type'], 'text/x-python')
+        self.assertEqual(response.content, b'')
+
+    def test_other_students_cannot_download(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_missing_file(self):
+        submission = Submission.objects.create(task=self.task, user=self.student, prompt_text='plan')
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('submission-download', kwargs={'pk': submission.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='')
+    def test_streams_without_nginx(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Accel-Redirect', response)
+        # Draining streaming_content closes the response (and the file).
+        self.assertEqual(b''.join(response.streaming_content), b'print(1)')
+
+    def test_task_attachment_requires_login(self):
+        self.task.attachment.save('spec.pdf', ContentFile(b'%PDF'))
+        url = reverse('task-attachment', kwargs={'pk': self.task.pk})
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_authenticate(self.other)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.task.attachment.name)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_serializers_return_download_urls(self):
+        self.task.attachment.save('spec.pdf', ContentFile(b'%PDF'))
+        self.client.force_authenticate(self.student)
+        submission = self.client.get(reverse('submission-detail', kwargs={'pk': self.submission.pk})).json()
+        self.assertEqual(submission['file'], 'http://testserver' + self.url)
+        task = self.client.get(reverse('task-detail', kwargs={'pk': self.task.pk})).json()
+        self.assertEqual(task['attachment'], 'http://testserver' + reverse('task-attachment', kwargs={'pk': self.task.pk}))
+        request = RequestFactory().get('/')
+        self.assertEqual(SubmissionSerializer(self.submission, context={'request': request}).data['file'],
+                         'http://testserver' + self.url)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN-based regression suite for the hot course queries. The data set is
+    large and skewed enough (few ungraded rows, many topics, deep submission
+    histories per user and task) that the planner only picks the indexes when
+    they really are the cheaper plan.
+    """
+    users = 20
+    topics = 400
+    tasks_per_topic = 5
+    submitted_tasks = 20
+    submissions = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(email=f'student{i}@example.com', name=f'Student {i}', password='!') for i in range(cls.users)
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        topics = Topic.objects.bulk_create(Topic(title=f'Topic {i}') for i in range(cls.topics))
+        Task.objects.bulk_create(
+            Task(topic=topic, title=f'Task {j}') for topic in topics for j in range(cls.tasks_per_topic)
+        )
+        Video.objects.bulk_create(Video(topic=topic, title=f'Video {j}') for topic in topics for j in range(10))
+        task_ids = list(Task.objects.values_list('pk', flat=True))
+        start = timezone.now() - timedelta(days=90)
+        # Spread submitted_at over time instead of letting auto_now_add stamp every row alike.
+        with mock.patch.object(Submission._meta.get_field('submitted_at'), 'auto_now_add', False):
+            Submission.objects.bulk_create(
+                (Submission(task_id=task_ids[i % cls.submitted_tasks], user_id=user_ids[i * 7 % len(user_ids)],
+                            submitted_at=start + timedelta(minutes=i), grade=None if i % 20 == 0 else i % 100)
+                 for i in range(cls.submissions)),
+                batch_size=2000,
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user_id, cls.task_id, cls.topic_id = user_ids[3], task_ids[5], topics[2].pk
+
+    def assertIndexScan(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort\b')
+        else:
+            for line in plan.splitlines():
+                self.assertFalse('SCAN' in line and 'USING' not in line, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def page(self, queryset):
+        # SubmissionCursorPagination: first page, then a keyset page.
+        ordered = queryset.order_by('submitted_at', 'id')
+        boundary = ordered[50]
+        after = ordered.filter(Q(submitted_at__gte=boundary.submitted_at),
+                               Q(submitted_at__gt=boundary.submitted_at) |
+                               Q(submitted_at=boundary.submitted_at, id__gt=boundary.pk))
+        return ordered[:51], after[:51]
+
+    def test_submissions_of_user(self):
+        for queryset in self.page(Submission.objects.filter(user_id=self.user_id)):
+            self.assertIndexScan(queryset, 'submission_user_time_idx')
+
+    def test_submissions_for_task(self):
+        for queryset in self.page(Submission.objects.filter(task_id=self.task_id)):
+            self.assertIndexScan(queryset, 'submission_task_time_idx')
+
+    def test_ungraded_submissions(self):
+        for queryset in self.page(Submission.objects.filter(grade__isnull=True)):
+            self.assertIndexScan(queryset, 'submission_ungraded_idx')
+
+    def test_topic_tasks_and_videos(self):
+        self.assertIndexScan(Task.objects.filter(topic_id=self.topic_id).order_by('created_at'), 'task_topic_created_idx')
+        self.assertIndexScan(Video.objects.filter(topic_id=self.topic_id).order_by('created_at'), 'video_topic_created_idx')
+
+
+class SeedScaleTests(TempMediaMixin, TestCase):
+    args = ['--users', '30', '--topics', '3', '--tasks', '6', '--videos', '9', '--submissions', '400',
+            '--distinct-files', '25', '--file-ratio', '0.9', '--batch-size', '70', '--password', 'secret']
+
+    def setUp(self):
+        self.media = self.use_temp_media()
+
+    def seed(self, *args):
+        call_command('seed_scale', *self.args, *args, stdout=io.StringIO())
+
+    def snapshot(self):
+        return list(Submission.objects.order_by('submitted_at', 'id').values_list(
+            'user__email', 'task__title', 'file', 'prompt_text', 'grade', 'submitted_at'))
+
+    def test_seeds_rows_files_and_refcounts(self):
+        from course.management.commands import seed_scale
+
+        with mock.patch.object(seed_scale, 'make_password', wraps=seed_scale.make_password) as hasher:
+            self.seed('--workers', '2')
+        hasher.assert_called_once()
+        self.assertEqual(
+            [User.objects.count(), Topic.objects.count(), Video.objects.count(), Task.objects.count()], [30, 3, 9, 6])
+        self.assertEqual(Submission.objects.count(), 400)
+        self.assertTrue(User.objects.get(email=f'user7@{seed_scale.EMAIL_DOMAIN}').check_password('secret'))
+        # Timestamps are spread out, not stamped by auto_now_add.
+        self.assertEqual(Submission.objects.order_by('submitted_at').first().submitted_at, seed_scale.EPOCH)
+        self.assertGreater(Submission.objects.dates('submitted_at', 'day').count(), 300)
+
+        with_file = Submission.objects.exclude(file='')
+        self.assertGreater(with_file.count(), 300)
+        blobs = {blob.name: blob for blob in Blob.objects.all()}
+        self.assertEqual(sum(blob.refcount for blob in blobs.values()), with_file.count())
+        for name in set(with_file.values_list('file', flat=True)):
+            with open(os.path.join(self.media, name), 'rb') as fh:
+                content = fh.read()
+            self.assertEqual(hashlib.sha256(content).hexdigest(), blobs[name].sha256)
+            self.assertEqual(len(content), blobs[name].size)
+
+        with self.assertRaises(CommandError):
+            self.seed('--workers', '0')
+
+    def test_same_seed_same_data(self):
+        self.seed('--workers', '0')
+        first = self.snapshot()
+        for model in (Submission, Blob, Task, Video, Topic, User):
+            model.objects.all().delete()
+        self.seed('--workers', '0')
+        self.assertEqual(self.snapshot(), first)
+        for model in (Submission, Blob, Task, Video, Topic, User):
+            model.objects.all().delete()
+        self.seed('--workers', '0', '--seed', '1')
+        self.assertNotEqual(self.snapshot(), first)
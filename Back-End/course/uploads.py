@@ -0,0 +1,86 @@
+import fcntl
+import hashlib
+import os
+import re
+from django.core.files import File
+
+BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class PartialFile(File):
+    """
+    Exposes ``temporary_file_path`` so ``FileSystemStorage`` moves the finished
+    upload into place instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        return None
+    start, end, total = map(int, match.groups())
+    if end < start:
+        return None
+    return start, end, total
+
+
+def current_offset(upload):
+    try:
+        return os.path.getsize(upload.partial_path)
+    except FileNotFoundError:
+        return 0
+
+
+def append_chunk(upload, stream, start, length):
+    """
+    Appends ``length`` bytes from ``stream`` at ``start``, which must equal the
+    current on-disk size. Returns the new offset. The body is copied in
+    ``BLOCK_SIZE`` pieces and never held in memory as a whole.
+    """
+    os.makedirs(os.path.dirname(upload.partial_path), exist_ok=True)
+    with open(upload.partial_path, 'ab') as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk for this upload is in progress.', 409)
+        offset = fh.tell()
+        if start != offset:
+            raise UploadError(f'Expected chunk starting at byte {offset}.', 409)
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            fh.write(block)
+            remaining -= len(block)
+        fh.flush()
+        os.fsync(fh.fileno())
+        offset = fh.tell()
+    if remaining:
+        raise UploadError('Request body shorter than Content-Range.', 400)
+    return offset
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discard_partial(upload):
+    try:
+        os.remove(upload.partial_path)
+    except FileNotFoundError:
+        pass
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SubmissionViewSet, TaskViewSet, TopicViewSet, TopicWithTasksView, TopicWithVideosView, VideoViewSet
+from .views import ChunkedUploadViewSet, SubmissionViewSet, TaskViewSet, TopicViewSet, TopicWithTasksView, TopicWithVideosView, VideoViewSet
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -10,6 +10,7 @@ router.register('videos', VideoViewSet)
 router.register('tasks', TaskViewSet)
 router.register('submit', SubmissionViewSet, basename='submission')
 router.register('topics', TopicViewSet, basename='topics')
+router.register('uploads', ChunkedUploadViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
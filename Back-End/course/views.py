@@ -1,12 +1,33 @@
+import csv
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework import viewsets, generics
-from .permissions import IsAdminOrReadOnly, IsOwnerOrAdminForSubmission
-from .models import Submission, Topic, Video, Task
-from .serializers import SubmissionSerializer, TaskSerializer, TopicSerializer, TopicWithTasksSerializer, TopicWithVideosSerializer, VideoSerializer
+from rest_framework import mixins, status, viewsets, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from AiAgentWeb.fast_json import FastJSONParser, FastJSONRenderer
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .fast_serializers import CompiledReadMixin
+from .downloads import download_name, download_response
+from .exports import export_rows, stream_csv, stream_ndjson
+from .filters import SubmissionFilter
+from .grading import enqueue_grading
+from .pagination import SubmissionCursorPagination
+from .parsers import CSVParser, read_csv_rows
+from .renderers import CSVRenderer, NDJSONRenderer
+from .permissions import IsAdminOrReadOnly, IsOwner, IsOwnerOrAdminForSubmission
+from .models import ChunkedUpload, Submission, Topic, Video, Task
+from .uploads import PartialFile, UploadError, append_chunk, current_offset, discard_partial, file_sha256, parse_content_range
+from .serializers import BulkGradeSerializer, ChunkedUploadSerializer, SubmissionSerializer, TaskSerializer, TopicSerializer, TopicWithTasksSerializer, TopicWithVideosSerializer, VideoSerializer
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(ConditionalGetMixin, CachedResponseMixin, CompiledReadMixin, viewsets.ModelViewSet):
     queryset = Topic.objects.all()
     serializer_class = TopicSerializer
+    lookup_value_regex = r'\d+'
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -16,38 +37,198 @@ class TopicViewSet(viewsets.ModelViewSet):
         
         return [permission() for permission in permission_classes]   
 
-class TopicWithVideosView(generics.RetrieveAPIView):
-    queryset = Topic.objects.prefetch_related("videos").all()
+    def get_validator_querysets(self):
+        if 'pk' in self.kwargs:
+            pk = self.kwargs['pk']
+            return [Topic.objects.filter(pk=pk), Video.objects.filter(topic_id=pk), Task.objects.filter(topic_id=pk)]
+        return [Topic.objects.all(), Video.objects.all(), Task.objects.all()]
+
+class TopicWithVideosView(ConditionalGetMixin, CachedResponseMixin, CompiledReadMixin, generics.RetrieveAPIView):
+    queryset = Topic.objects.all()
     serializer_class = TopicWithVideosSerializer
     permission_classes = [IsAuthenticated] 
 
-class TopicWithTasksView(generics.RetrieveAPIView):
-    queryset = Topic.objects.prefetch_related("tasks").all()
+    def get_validator_querysets(self):
+        pk = self.kwargs['pk']
+        return [Topic.objects.filter(pk=pk), Video.objects.filter(topic_id=pk)]
+
+class TopicWithTasksView(ConditionalGetMixin, CachedResponseMixin, CompiledReadMixin, generics.RetrieveAPIView):
+    queryset = Topic.objects.all()
     serializer_class = TopicWithTasksSerializer
     permission_classes = [IsAuthenticated]
 
-class VideoViewSet(viewsets.ModelViewSet):
+    def get_validator_querysets(self):
+        pk = self.kwargs['pk']
+        return [Topic.objects.filter(pk=pk), Task.objects.filter(topic_id=pk)]
+
+class VideoViewSet(ConditionalGetMixin, CachedResponseMixin, CompiledReadMixin, viewsets.ModelViewSet):
     queryset = Video.objects.all()
     serializer_class = VideoSerializer
+    lookup_value_regex = r'\d+'
     permission_classes = [IsAdminOrReadOnly]
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ConditionalGetMixin, CachedResponseMixin, CompiledReadMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    lookup_value_regex = r'\d+'
     permission_classes = [IsAdminOrReadOnly]
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)  
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def attachment(self, request, pk=None):
+        task = self.get_object()
+        return download_response(task.attachment, download_name(f'task-{task.pk}', task.attachment))
+
+class SubmissionViewSet(CompiledReadMixin, viewsets.ModelViewSet):
     serializer_class = SubmissionSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrAdminForSubmission]
+    pagination_class = SubmissionCursorPagination
+    filter_backends = [SubmissionFilter]
+    export_chunk_size = 2000
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation (AiAgentWeb.api_docs) has no real user.
+            return Submission.objects.none()
         user = self.request.user
+        queryset = Submission.objects.select_related('user', 'task')
         if user.is_staff:  
-            return Submission.objects.all()
-        return Submission.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
+
+    def perform_create(self, serializer):
+        submission = serializer.save(user=self.request.user)
+        enqueue_grading(submission)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        # get_queryset limits students to their own rows; the permission
+        # classes then apply the owner/staff rules.
+        submission = self.get_object()
+        return download_response(submission.file, download_name(f'submission-{submission.pk}', submission.file))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser],
+            renderer_classes=[NDJSONRenderer, CSVRenderer, FastJSONRenderer])
+    def export(self, request):
+        """Streams every matching submission; pick the format with ?format=ndjson|csv or Accept."""
+        rows = export_rows(self.filter_queryset(self.get_queryset()), self.export_chunk_size)
+        if request.accepted_renderer.format == 'csv':
+            response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+            filename = 'submissions.csv'
+        else:
+            response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+            filename = 'submissions.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='grade', permission_classes=[IsAdminUser],
+            parser_classes=[FastJSONParser, CSVParser, MultiPartParser])
+    def bulk_grade(self, request):
+        """
+        Grades many submissions at once. Accepts a JSON list of {"id", "grade"}
+        rows, a text/csv body, or a multipart CSV upload in ``file`` with the
+        same two columns. An empty grade clears it.
+        """
+        data = request.data
+        if 'file' in request.FILES:
+            try:
+                data = read_csv_rows(request.FILES['file'].read().decode('utf-8-sig'))
+            except (UnicodeDecodeError, csv.Error) as exc:
+                raise ParseError('CSV parse error - %s' % exc)
+        serializer = BulkGradeSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': serializer.save()})
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads for submission files and task attachments:
+
+    1. ``POST /uploads/`` with target, task, filename, size and sha256.
+    2. ``PUT /uploads/<id>/`` once per chunk with ``Content-Range: bytes a-b/size``
+       and the raw bytes as body; ``GET /uploads/<id>/`` reports the offset
+       to resume from after a dropped connection.
+    3. ``POST /uploads/<id>/finalize/`` verifies the checksum and attaches the file.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated, IsOwner]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ChunkedUpload.objects.none()
+        return ChunkedUpload.objects.filter(user=self.request.user, status=ChunkedUpload.UPLOADING)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        discard_partial(instance)
+        instance.delete()
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        upload.offset = current_offset(upload)
+        return Response(self.get_serializer(upload).data)
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        content_range = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'))
+        if content_range is None:
+            return Response({'detail': 'A "Content-Range: bytes start-end/size" header is required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = content_range
+        length = end - start + 1
+        if total != upload.size or end >= upload.size:
+            return Response({'detail': 'Content-Range does not match the declared size.'},
+                            status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response({'detail': f'Chunks are limited to {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes.'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            if request.stream is None:
+                raise UploadError('Request body is empty.', status.HTTP_400_BAD_REQUEST)
+            upload.offset = append_chunk(upload, request.stream, start, length)
+        except UploadError as exc:
+            upload.offset = current_offset(upload)
+            upload.save(update_fields=['offset', 'updated_at'])
+            return Response({'detail': str(exc), 'offset': upload.offset}, status=exc.status)
+        upload.save(update_fields=['offset', 'updated_at'])
+        return Response({'id': upload.pk, 'offset': upload.offset})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        upload = self.get_object()
+        with transaction.atomic():
+            # Lock the row and re-check its status, so two finalize requests
+            # racing past get_object() cannot attach the same upload twice.
+            upload = ChunkedUpload.objects.select_for_update().filter(
+                pk=upload.pk, status=ChunkedUpload.UPLOADING).first()
+            if upload is None:
+                return Response({'detail': 'Upload is already finalized.'}, status=status.HTTP_409_CONFLICT)
+            offset = current_offset(upload)
+            if offset != upload.size:
+                return Response({'detail': 'Upload is incomplete.', 'offset': offset}, status=status.HTTP_409_CONFLICT)
+            if file_sha256(upload.partial_path) != upload.sha256:
+                self.perform_destroy(upload)
+                return Response({'detail': 'Checksum mismatch; the upload was discarded.'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+            with open(upload.partial_path, 'rb') as fh:
+                content = PartialFile(fh, name=upload.filename)
+                if upload.target == ChunkedUpload.SUBMISSION:
+                    submission = Submission(task=upload.task, user=upload.user)
+                    submission.file.save(upload.filename, content, save=True)
+                    enqueue_grading(submission)
+                    upload.submission = submission
+                    data = SubmissionSerializer(submission, context={'request': request}).data
+                else:
+                    upload.task.attachment.save(upload.filename, content, save=True)
+                    data = TaskSerializer(upload.task, context={'request': request}).data
+                upload.status = ChunkedUpload.COMPLETE
+                upload.offset = offset
+                upload.save(update_fields=['status', 'offset', 'submission', 'updated_at'])
+        discard_partial(upload)
+        return Response(data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,49 @@
+"""
+gunicorn settings for the web container: ``gunicorn -c gunicorn.conf.py AiAgentWeb.wsgi:application``.
+
+The app is imported once in the master (``preload_app``) and warmed up
+before workers fork, so every worker starts with the URL resolvers and
+serializers built and shares those pages copy-on-write.
+
+Workers are threaded (gthread), WEB_THREADS requests each. Login and
+registration hand their password hash to a bounded pool (account.hashing)
+sized from the same variable, so a login burst can hold at most half of a
+worker's threads and the rest keep serving the API.
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+preload_app = True
+
+
+def on_starting(server):
+    from AiAgentWeb import boot
+
+    problem = boot.shared_cache_problem(server.num_workers)
+    if problem:
+        # gunicorn prints RuntimeErrors and exits with status 1.
+        raise RuntimeError(problem)
+    # Per-worker metric snapshots (AiAgentWeb.metrics) only ever grow; a new
+    # master starts them from zero.
+    directory = os.environ.get('METRICS_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def when_ready(server):
+    from django.db import connections
+    from AiAgentWeb import boot
+
+    server.log.info('Warm-up done in %.3fs', boot.warm_up())
+    # Nothing may stay open across fork.
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    from AiAgentWeb import boot
+
+    boot.report_first_request(worker.log)